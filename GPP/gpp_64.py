@@ -14,7 +14,7 @@ See the License for the specific language governing permissions and
 limitations under the License.
 """
 
-from armv8_platform import FullSystem
+from armv8_platform import FullSystem, mesh_placement
 import os
 
 gpp_home = os.path.join(os.environ['VPSIM_HOME'], 'GPP')
@@ -35,7 +35,7 @@ conf = {
         },
         'cpu_clusters': [
             # CPUs in cluster, NoC position (X,Y)
-            # Filled automatically hereafter (lines 180-191)
+            # Filled automatically hereafter (see mesh_placement below)
         ],
         'quantum': 65535,
         'conversion_factor': 3.0, # example: cpu_frequency = 3.0 GHz & IPC = 1
@@ -147,7 +147,7 @@ conf = {
 
                 'home-nodes': [
                     # Base address, size, NoC position (X,Y)
-                    # Filled automatically hereafter (lines 194-214)
+                    # Filled automatically hereafter (see mesh_placement below)
                 ],
             },
         },
@@ -193,40 +193,22 @@ conf = {
 }
 
 if __name__ == '__main__':
-    # Filling the clusters
-    x_nodes = conf['memory_subsystem']['noc']['x-nodes']
-    y_nodes = conf['memory_subsystem']['noc']['y-nodes']
-    cpu_id = 0
-
-    for i in range(x_nodes):
-        for j in range(y_nodes):
-            if ((i==0 or i==5) and (j==0 or j==1 or j==10 or j==11)):
-                continue
-            if cpu_id < conf['cpu']['cores']:
-                conf['cpu']['cpu_clusters'].append( ([cpu_id], (i, j)) )
-                cpu_id += 1
-
-    # Filling the home nodes
-    n_cores = conf['cpu']['cores']
-    hn_cores = 64
-    total_ram_size = conf['ram'][0]['size']
-    ram_base = conf['ram'][0]['base']
-    hn_addr = ram_base
-    hn_size = total_ram_size // hn_cores
-    hn_list = conf['memory_subsystem']['cache']['l3']['home-nodes']
-
-    for i in range(x_nodes):
-        for j in range(y_nodes):
-            if ((i==0 or i==5) and (j==0 or j==1 or j==10 or j==11)):
-                continue
-            if total_ram_size >= hn_size:
-                hn_list.append( (hn_addr, hn_size, (i,j)) )
-                hn_addr += hn_size
-                total_ram_size -= hn_size
-
-    # assign remaining address slice to first HN
-    bs, sz, node = hn_list[-1]
-    hn_list[-1] = (bs, sz + total_ram_size, node)
+    # Fill the clusters and the home nodes column by column, leaving the
+    # mesh corners free, and give each home node an equal slice of the RAM
+    noc = conf['memory_subsystem']['noc']
+    placement = mesh_placement(noc['x-nodes'], noc['y-nodes'],
+        cores=conf['cpu']['cores'],
+        cores_per_cluster=conf['cpu']['cores_per_cluster'],
+        home_nodes=conf['cpu']['cores'],
+        memory_controllers=[pos for _, _, pos in conf['memory_subsystem']['off-chip-memory']['memory-controllers']],
+        ram_base=conf['ram'][0]['base'],
+        ram_size=conf['ram'][0]['size'],
+        interleave_step=conf['memory_subsystem']['cache']['l3']['interleave_step'],
+        strategy='column-major',
+        reserved=[(x, y) for x in (0, 5) for y in (0, 1, 10, 11)])
+    conf['cpu']['cpu_clusters'] = placement['cpu_clusters']
+    conf['memory_subsystem']['cache']['l3']['home-nodes'] = placement['home-nodes']
+    conf['memory_subsystem']['off-chip-memory']['memory-controllers'] = placement['memory-controllers']
 
     # Build the config
     sys = FullSystem(conf)
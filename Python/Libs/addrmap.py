@@ -0,0 +1,87 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import bisect, heapq
+
+class AddressMap(object):
+    '''
+    Interval index over the memory-mapped regions of a platform.
+    Every region is kept as a (base, end, name) tuple, end being exclusive.
+    Regions of size 0 (e.g. the PCIe host bridge, whose windows are
+    defined inside QEMU) are recorded as a single address.
+    '''
+    def __init__(self):
+        self.regions = []
+        self.__bases = None
+
+    def add(self, name, base, size):
+        base = _g(base)
+        self.regions.append((base, base + max(_g(size), 1), name))
+        self.__bases = None
+
+    def __index(self):
+        # Regions sorted by base, with the running maximum of their end
+        # addresses: a lookup only walks back while an earlier region can
+        # still reach the queried address.
+        if self.__bases is None:
+            self.regions.sort()
+            self.__bases = [r[0] for r in self.regions]
+            self.__reach = []
+            reach = 0
+            for r in self.regions:
+                reach = max(reach, r[1])
+                self.__reach.append(reach)
+
+    def lookup(self, addr):
+        ''' Return the names of the regions mapping addr (usually one). '''
+        self.__index()
+        addr = _g(addr)
+        found = []
+        i = bisect.bisect_right(self.__bases, addr) - 1
+        while i >= 0 and self.__reach[i] > addr:
+            if self.regions[i][1] > addr:
+                found.append(self.regions[i][2])
+            i -= 1
+        return found[::-1]
+
+    def overlaps(self):
+        ''' Return all (region, region) pairs sharing at least one address. '''
+        self.__index()
+        pairs = []
+        active = []
+        for r in self.regions:
+            while active and active[0][0] <= r[0]:
+                heapq.heappop(active)
+            for _, other in active:
+                pairs.append((other, r))
+            heapq.heappush(active, (r[1], r))
+        return pairs
+
+    def check(self):
+        pairs = self.overlaps()
+        if pairs:
+            raise Exception("Overlapping memory-mapped regions:\n%s" % "\n".join(
+                "  %s [%s-%s] and %s [%s-%s]" % (a[2], hex(a[0]), hex(a[1]-1), b[2], hex(b[0]), hex(b[1]-1))
+                for a, b in pairs))
+
+    def dump(self):
+        self.__index()
+        return "\n".join("%#018x-%#018x %s" % (b, e-1, n) for b, e, n in self.regions)
+
+def _g(val):
+   if type(val)==str:
+       return int(val,16)
+   return val
@@ -0,0 +1,134 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os, re, time, socket, threading, gzip
+
+class Console(object):
+    '''
+    Client of a guest serial console exposed by QEMU on a Unix socket.
+    A background thread drains the socket into a bounded buffer (the last
+    `history` bytes) and, optionally, into a gzip transcript of the whole
+    session. read() and expect() consume the buffer from a cursor.
+    '''
+    def __init__(self, path, history=1 << 20, transcript=None, timeout=60):
+        self.path = path
+        self.history = history
+        self.closed = False
+        self.__buf = bytearray()
+        self.__base = 0     # stream offset of __buf[0]
+        self.__pos = 0      # stream offset of the read cursor
+        self.__cond = threading.Condition()
+        self.__sock = self.__connect(path, timeout)
+        self.__transcript = gzip.open(transcript, 'wb') if transcript else None
+        self.__thread = threading.Thread(target=self.__reader, daemon=True)
+        self.__thread.start()
+
+    def __connect(self, path, timeout):
+        deadline = time.time() + timeout
+        while True:
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                if len(path) < 100:
+                    s.connect(path)
+                else:
+                    # Run directories easily exceed the 108 bytes of sun_path
+                    d = os.open(os.path.dirname(path) or '.', os.O_RDONLY)
+                    try:
+                        s.connect('/proc/self/fd/%d/%s' % (d, os.path.basename(path)))
+                    finally:
+                        os.close(d)
+                return s
+            except OSError:
+                s.close()
+                if time.time() > deadline:
+                    raise Exception("Could not connect to console %s" % path)
+                time.sleep(0.1)
+
+    def __reader(self):
+        while True:
+            try:
+                data = self.__sock.recv(65536)
+            except OSError:
+                data = b''
+            with self.__cond:
+                if not data:
+                    self.closed = True
+                    self.__cond.notify_all()
+                    break
+                self.__buf += data
+                excess = len(self.__buf) - self.history
+                if excess > 0:
+                    del self.__buf[:excess]
+                    self.__base += excess
+                if self.__transcript:
+                    self.__transcript.write(data)
+                self.__cond.notify_all()
+        if self.__transcript:
+            self.__transcript.close()
+
+    def __pending(self):
+        # Output older than the buffer is lost to the reader
+        self.__pos = max(self.__pos, self.__base)
+        return self.__buf[self.__pos - self.__base:]
+
+    def read(self, timeout=0):
+        ''' Return the console output not read yet, waiting up to timeout seconds for some. '''
+        with self.__cond:
+            self.__cond.wait_for(lambda: self.closed or len(self.__pending()), timeout)
+            data = bytes(self.__pending())
+            self.__pos += len(data)
+        return data.decode('utf-8', 'replace')
+
+    def expect(self, pattern, timeout=60):
+        '''
+        Wait until the unread output matches a regular expression and move
+        the cursor past the match. Returns (text before the match, match).
+        '''
+        r = re.compile(pattern.encode() if isinstance(pattern, str) else pattern)
+        found = []
+        def match():
+            m = r.search(self.__pending())
+            if m:
+                found.append(m)
+            return m or self.closed
+        with self.__cond:
+            self.__cond.wait_for(match, timeout)
+            if not found:
+                raise Exception("Console %s: '%s' not found %s" % (
+                    self.path, r.pattern.decode('utf-8', 'replace'), 'before it closed' if self.closed else 'after %ss' % timeout))
+            m = found[0]
+            before = bytes(self.__pending()[:m.start()])
+            self.__pos += m.end()
+        return before.decode('utf-8', 'replace'), m
+
+    def write(self, data):
+        self.__sock.sendall(data.encode() if isinstance(data, str) else data)
+
+    def sendline(self, line):
+        self.write(line + '\n')
+
+    def buffer(self):
+        ''' The last `history` bytes of output, read or not. '''
+        with self.__cond:
+            return bytes(self.__buf).decode('utf-8', 'replace')
+
+    def close(self):
+        try:
+            self.__sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.__sock.close()
+        self.__thread.join()
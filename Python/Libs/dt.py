@@ -242,6 +242,19 @@ def c_fw_cfg(conf, dt):
                 hex(0xa&0xFFFFFFFF)
         ))
 
+def c_sesam_monitor(conf, dt):
+    dt['dev'].append("""
+        sesam-monitor@%s {
+            compatible = "cea,sesam-monitor";
+            reg = <%s %s %s %s>;
+        };
+    """ % (
+            hex(conf['base'])[2:],
+            hex(_g(conf['base'])>>32),
+            hex(_g(conf['base'])&0xFFFFFFFF),
+            hex(_g(conf['size'])>>32),
+            hex(_g(conf['size'])&0xFFFFFFFF)))
+
 def c_pl031(conf, dt):
     dt['dev'].append("""
         rtc@%s {
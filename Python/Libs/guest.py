@@ -0,0 +1,147 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os, re
+
+from vpstats import roi_log, attachOutput
+
+# Unattended guest sessions over a socket console (see console.py): log in,
+# run commands and 'sesam benchmark' invocations, then 'sesam quit'.
+
+_status = '@@status='
+# Printed by 'sesam benchmark' once the application is found, with the name
+# of its sesamBench logs
+_region = re.compile(r'^sesam: region (.+?)\r?$', re.M)
+
+class GuestSession(object):
+    def __init__(self, console, prompt=r'[#$] $', user='root', password=None):
+        self.console = console
+        self.prompt = prompt
+        self.user = user
+        self.password = password
+        self.results = []
+
+    def login(self, timeout=600):
+        ''' Wait for the login prompt (the guest may still be booting) and log in. '''
+        self.console.expect(r'login: $', timeout)
+        self.console.sendline(self.user)
+        if self.password is not None:
+            self.console.expect(r'[Pp]assword: $', 60)
+            self.console.sendline(self.password)
+        self.console.expect(self.prompt, 60)
+
+    def run(self, command, timeout=600):
+        '''
+        Run a shell command and wait for the prompt to come back.
+        Returns (exit status, output without the echoed command line).
+        '''
+        # The echoed command line shows '$?', not a number
+        self.console.sendline('%s; echo %s$?' % (command, _status))
+        out, m = self.console.expect(r'%s(\d+)\r?\n' % re.escape(_status), timeout)
+        self.console.expect(self.prompt, 60)
+        out = out.replace('\r\n', '\n').split('\n', 1)
+        output = out[1] if len(out) > 1 else ''
+        status = int(m.group(1))
+        self.results.append({'command': command, 'status': status, 'output': output})
+        return status, output
+
+    def benchmark(self, app, timeout=3600):
+        '''
+        Run an application as a 'sesam benchmark' region of interest. app may
+        start with benchmark options, e.g. '--pmu ./my_app'. The result gets
+        the 'app' of its log only when the region was opened.
+        '''
+        args = app.split()
+        while args and args[0].startswith('--'):
+            args.pop(0)
+        if not args:
+            raise Exception("No application in benchmark '%s'." % app)
+        status, output = self.run('sesam benchmark %s' % app, timeout)
+        m = _region.search(output)
+        if m:
+            self.results[-1]['app'] = m.group(1)
+        elif status == 0:
+            # sesam tools that do not print the region: the tool names it
+            # after the application, symlinks resolved
+            self.results[-1]['app'] = os.path.basename(args[0])
+        return status, output
+
+    def quit(self):
+        self.console.sendline('sesam quit')
+
+    def attach(self, working_dir):
+        '''
+        Pair each benchmark with its sesamBench_<app>_<n>.log file (in order of
+        n for each application) and write its output next to it as
+        sesamBench_<app>_<n>.out. Returns the results with their 'log' file.
+        '''
+        logs = {}
+        for f in os.listdir(working_dir):
+            t = roi_log.match(f)
+            if t:
+                logs.setdefault(t.group(1), []).append((int(t.group(2)), f))
+        for app in logs:
+            logs[app].sort()
+        for r in self.results:
+            if 'app' in r and logs.get(r['app']):
+                _, r['log'] = logs[r['app']].pop(0)
+                with open(os.path.join(working_dir, os.path.splitext(r['log'])[0] + '.out'), 'w') as f:
+                    f.write(r['output'])
+        return self.results
+
+def automate(system, steps, uart=None, login_timeout=600, transcript=None, grace=60, **login):
+    '''
+    Boot a FullSystem whose UART has 'console': 'socket', log in and run the
+    steps: shell commands (str), or dicts {'run': cmd} / {'benchmark': app}
+    with an optional 'timeout'. Ends with 'sesam quit' and waits for the
+    stats. Returns the results of the steps (command, status, output and,
+    for benchmarks, the matching 'log' file).
+    When the login or a step fails, the run is aborted (system.stop(), the
+    simulator is terminated if it has not quit after grace seconds) and
+    the exception is raised.
+    '''
+    system.build(simulate=True, wait=False, silent=True)
+    con = system.console(uart, timeout=login_timeout, transcript=transcript)
+    session = GuestSession(con, **login)
+    try:
+        session.login(login_timeout)
+        for step in steps:
+            if isinstance(step, str):
+                step = {'run': step}
+            if 'benchmark' in step:
+                session.benchmark(step['benchmark'], step.get('timeout', 3600))
+            else:
+                session.run(step['run'], step.get('timeout', 600))
+        session.quit()
+    except Exception as e:
+        # Unless the run was stopped early with system.stop() (e.g. by
+        # sampling.EarlyStop), end the simulation so that the run completes
+        if not system.truncated:
+            try:
+                system.stop('guest session failed: %s' % e, grace, failed=True)
+                system.waitStats()
+            except Exception as stop_error:
+                print("Could not stop %s: %s" % (system.name, stop_error))
+            con.close()
+            raise
+    system.waitStats()
+    con.close()
+    results = session.attach(system.working_dir)
+    outputs = dict((r['log'], r['output']) for r in results if 'log' in r)
+    for roi in system.rois:
+        if roi['file'] in outputs:
+            attachOutput(roi, outputs[roi['file']])
+    return results
@@ -0,0 +1,104 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os, re, json, time, hashlib, threading
+
+from vpstats import statsFromJson, loadStats
+
+# Append-only journal of the runs of a sweep (vpsim.SetJournal()), one JSON
+# record per line and per event: 'submitted', 'running' (with the pid and
+# the run directory of the simulator) and 'completed' (with the state of
+# the run and its stats.json, or its stats when the directory is not kept).
+# A run is identified by the sha256 of its XML description (canonical()) and by its
+# occurrence among the submissions of that description, so that a driver
+# restarted on the same journal finds the runs of the previous one.
+
+def canonical(xml):
+    '''
+    The XML of a run with the instance names numbered by vpsim (Memory1,
+    ...) renumbered from 0 in order of appearance: the numbering goes on
+    across all the systems of a driver, so the same configuration gets
+    other names depending on what was built before it.
+    '''
+    names = {}
+    count = {}
+    for cls, name in re.findall(r'<(\w+) name="(\1\d+)">', xml):
+        if name not in names:
+            names[name] = '%s#%d' % (cls, count.get(cls, 0))
+            count[cls] = count.get(cls, 0) + 1
+    if not names:
+        return xml
+    auto = re.compile(r'\b(%s)\b' % '|'.join(re.escape(n) for n in names))
+    return auto.sub(lambda m: names[m.group(1)], xml)
+
+class Journal(object):
+    def __init__(self, path):
+        self.path = path
+        self.runs = {}
+        self.__seen = {}
+        self.__lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        r = json.loads(line)
+                    except ValueError:
+                        continue    # last line of a driver killed while writing
+                    self.runs.setdefault(r['key'], {}).update(r)
+        self.__file = open(path, 'a')
+
+    def key(self, xml):
+        ''' Key of the next submission of a run description. '''
+        digest = hashlib.sha256(canonical(xml).encode()).hexdigest()
+        with self.__lock:
+            n = self.__seen.get(digest, 0)
+            self.__seen[digest] = n + 1
+        return '%s-%d' % (digest, n)
+
+    def get(self, key):
+        ''' All the fields recorded for a run, the last 'event' included, or None. '''
+        with self.__lock:
+            r = self.runs.get(key)
+            return dict(r) if r else None
+
+    def record(self, event, key, **fields):
+        r = dict(fields, event=event, key=key, time=time.time())
+        line = json.dumps(r, default=str) + '\n'
+        with self.__lock:
+            self.__file.write(line)
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+            self.runs.setdefault(key, {}).update(r)
+
+    def close(self):
+        self.__file.close()
+
+def alive(record):
+    ''' Whether the simulator of a 'running' record still runs, in its run directory. '''
+    try:
+        # A dead pid, or one reused by another process, has another cwd
+        return os.path.realpath('/proc/%d/cwd' % record['pid']) == os.path.realpath(record['working_dir'])
+    except (OSError, KeyError):
+        return False
+
+def result(record):
+    ''' Stats of a 'completed' record, or None when they are gone. '''
+    if 'stats' in record:
+        return statsFromJson(record['stats'])
+    try:
+        return loadStats(record['result'])
+    except (OSError, KeyError, ValueError):
+        return None
@@ -0,0 +1,176 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import re
+import numpy as np
+
+# Miss ratio of each cache level follows a power law of its capacity:
+# miss = ref_miss * (size / ref_size) ** -alpha (the "sqrt(2) rule" for
+# alpha = 0.5). L2 and L3 ratios are local to the level.
+default_calibration = {
+    'l1': {'ref_size': 64*1024, 'ref_miss': 0.05, 'alpha': 0.5},
+    'l2': {'ref_size': 1024*1024, 'ref_miss': 0.3, 'alpha': 0.5},
+    'l3': {'ref_size': 8*1024*1024, 'ref_miss': 0.5, 'alpha': 0.5},
+}
+
+# Components and counters used to measure miss ratios in past stats
+cache_components = {
+    'l1': re.compile(r'^dcacheL1_'),
+    'l2': re.compile(r'^dcacheL2_'),
+    'l3': re.compile(r'^dcacheL3_'),
+}
+miss_counter = re.compile(r'miss(?!.*(rate|ratio))', re.I)
+access_counter = re.compile(r'access(?!.*(rate|ratio))', re.I)
+hit_counter = re.compile(r'hit(?!.*(rate|ratio))', re.I)
+total_counter = re.compile(r'^total', re.I)
+
+_fields = ['l1_size', 'l1_lat', 'l2_size', 'l2_lat', 'l3_size', 'l3_lat', 'line',
+           'hop', 'hops_hn', 'hops_mc', 'read_lat', 'mc_width', 'n_mc', 'cores',
+           'x_nodes', 'y_nodes', 'flit_size', 'flit_time', 'freq']
+
+def _mean_hops(a, b):
+    if not a or not b:
+        return 0.
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    return float(np.abs(a[:, None, :] - b[None, :, :]).sum(axis=2).mean())
+
+def features(conf):
+    ''' Extract the scalar parameters of the model from a FullSystem conf. '''
+    ms = conf['memory_subsystem']
+    cache, noc, mem = ms['cache'], ms['noc'], ms['off-chip-memory']
+    hns = cache['l3']['home-nodes']
+    clusters = [pos for _, pos in conf['cpu']['cpu_clusters']]
+    return {
+        'l1_size': cache['l1-data']['size'],
+        'l1_lat': cache['l1-data']['latency-ns'],
+        'l2_size': cache['l2']['size'],
+        'l2_lat': cache['l2']['latency-ns'],
+        'l3_size': cache['l3']['home-node-size'] * max(len(hns), 1),
+        'l3_lat': cache['l3']['latency-ns'],
+        'line': cache['l3']['line-size'],
+        'hop': noc['router-latency-ns'] + noc['link-latency-ns'],
+        'hops_hn': _mean_hops(clusters, [pos for _, _, pos in hns]),
+        'hops_mc': _mean_hops([pos for _, _, pos in hns], [pos for _, _, pos in mem['memory-controllers']]),
+        'read_lat': mem['read-latency-ns'],
+        'mc_width': mem['channel-width'] * mem['channels'],
+        'n_mc': len(mem['memory-controllers']),
+        'cores': conf['cpu']['cores'],
+        'x_nodes': noc['x-nodes'],
+        'y_nodes': noc['y-nodes'],
+        'flit_size': noc['flit-size'],
+        'flit_time': max(noc['router-latency-ns'], noc['link-latency-ns']),
+        'freq': conf['cpu'].get('conversion_factor', 1.),
+    }
+
+def _miss(size, cal):
+    return np.clip(cal['ref_miss'] * (size / float(cal['ref_size'])) ** -cal['alpha'], 0., 1.)
+
+def predict(confs, calibration=None):
+    '''
+    Estimate the average memory access latency and the bandwidth bounds of
+    a list of confs (or of features() dicts). Every entry of the returned
+    dict is a NumPy array with one value per configuration:
+    - amat_ns, amat_cycles: average latency of a data access,
+    - m1, m2, m3: predicted miss ratio of each cache level,
+    - dram_bw_gbs: latency bound of the memory controllers, one access of
+      channel-width * channels bytes per read latency each (not their peak
+      bandwidth),
+    - noc_bw_gbs: bisection bound of the mesh under uniform traffic,
+    - core_bw_gbs: latency bound with one outstanding miss per core,
+    - bw_bound_gbs: the smallest of the three.
+    '''
+    cal = dict(default_calibration, **(calibration or {}))
+    f = [c if 'l1_size' in c else features(c) for c in confs]
+    v = dict((k, np.array([x[k] for x in f], dtype=float)) for k in _fields)
+
+    m1 = _miss(v['l1_size'], cal['l1'])
+    m2 = _miss(v['l2_size'], cal['l2'])
+    m3 = _miss(v['l3_size'], cal['l3'])
+    # Round trips on the NoC: L2 to home node, home node to memory controller
+    to_mem = 2 * v['hops_mc'] * v['hop'] + v['read_lat']
+    to_l3 = 2 * v['hops_hn'] * v['hop'] + v['l3_lat'] + m3 * to_mem
+    amat = v['l1_lat'] + m1 * (v['l2_lat'] + m2 * to_l3)
+
+    dram = v['n_mc'] * v['mc_width'] / np.maximum(v['read_lat'], 1.)
+    # Half of uniform traffic crosses the bisection, in both directions
+    noc = 2 * 2 * np.minimum(v['x_nodes'], v['y_nodes']) * v['flit_size'] / np.maximum(v['flit_time'], 1e-3)
+    core = v['cores'] * v['line'] / np.maximum(amat, 1e-3)
+    return {
+        'amat_ns': amat,
+        'amat_cycles': amat * v['freq'],
+        'm1': m1, 'm2': m2, 'm3': m3,
+        'dram_bw_gbs': dram,
+        'noc_bw_gbs': noc,
+        'core_bw_gbs': core,
+        'bw_bound_gbs': np.minimum(np.minimum(dram, noc), core),
+    }
+
+def rank(confs, key='amat_ns', calibration=None, reverse=False):
+    ''' Return the indices of confs sorted by a predicted metric, best first. '''
+    order = np.argsort(predict(confs, calibration)[key], kind='stable')
+    return [int(i) for i in (order[::-1] if reverse else order)]
+
+def counted(names, counter_re):
+    '''
+    Names of the counters matching a pattern that add up without counting
+    twice: the total_* ones when there are some, else all of them (read_*,
+    write_*...).
+    '''
+    names = [n for n in names if counter_re.search(n)]
+    return [n for n in names if total_counter.search(n)] or names
+
+def _sum(stats, comp_re, counter_re):
+    total = 0.
+    for c in stats:
+        if comp_re.search(c):
+            values = dict((n, v[0]) for n, v in stats[c].items() if isinstance(v[0], (int, float)))
+            total += sum(values[n] for n in counted(values, counter_re))
+    return total
+
+def miss_ratios(stats):
+    ''' Measured miss ratio of each cache level in a stats dict, or None when not found. '''
+    ratios = {}
+    for lvl, comp in cache_components.items():
+        miss = _sum(stats, comp, miss_counter)
+        acc = _sum(stats, comp, access_counter) or (_sum(stats, comp, hit_counter) + miss)
+        ratios[lvl] = miss / acc if acc else None
+    return ratios
+
+def calibrate(samples, calibration=None):
+    '''
+    Fit the miss-ratio curves on past simulations.
+    samples is a list of (conf, stats) pairs. With a single cache size per
+    level only ref_miss is fitted; with several, alpha is fitted too
+    (least squares in log-log space).
+    '''
+    cal = dict((k, dict(v)) for k, v in dict(default_calibration, **(calibration or {})).items())
+    points = dict((lvl, []) for lvl in cache_components)
+    for conf, stats in samples:
+        f = features(conf)
+        for lvl, r in miss_ratios(stats).items():
+            if r:
+                points[lvl].append((f['%s_size' % lvl], r))
+    for lvl, pts in points.items():
+        if not pts:
+            continue
+        size, miss = np.log(np.array(pts, dtype=float)).T
+        if len(set(size)) > 1:
+            slope, icpt = np.polyfit(size, miss, 1)
+            cal[lvl]['alpha'] = float(-slope)
+            cal[lvl]['ref_miss'] = float(np.exp(icpt + slope * np.log(cal[lvl]['ref_size'])))
+        else:
+            cal[lvl]['ref_miss'] = float(np.exp(np.mean(miss + cal[lvl]['alpha'] * (size - np.log(cal[lvl]['ref_size'])))))
+    return cal
@@ -0,0 +1,151 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import re
+import numpy as np
+
+from mem_model import miss_counter, access_counter, hit_counter, counted
+
+# Standard metrics derived from the raw stats of runs, computed on arrays of
+# shape (runs, components) for all the components of a role at once.
+# Roles come from the platform (FullSystem.roles); components missing from
+# it get theirs from their name.
+
+name_roles = [
+    (re.compile(r'^cpu_\d+$'), 'cpu'),
+    (re.compile(r'^dcacheL1_'), 'l1'),
+    (re.compile(r'^dcacheL2_'), 'l2'),
+    (re.compile(r'^dcacheL3_'), 'l3'),
+    (re.compile(r'^network_on_chip$'), 'noc'),
+    (re.compile(r'^Inter(Data|Instr)_'), 'cluster_interconnect'),
+    (re.compile(r'^NoCMemoryController\d+$'), 'memory_controller'),
+    (re.compile(r'^Memory\d+$'), 'memory'),
+]
+
+instructions_counter = re.compile(r'^executed_instructions$')
+cycles_counter = re.compile(r'cycles', re.I)
+time_counter = re.compile(r'time', re.I)
+latency_counter = re.compile(r'latency', re.I)
+contention_counter = re.compile(r'contention', re.I)
+packet_counter = re.compile(r'packet|transaction', re.I)
+read_counter = re.compile(r'read(?!.*(latency|delay|rate|ratio))', re.I)
+write_counter = re.compile(r'write(?!.*(latency|delay|rate|ratio))', re.I)
+
+# Scale to ns of the time units; latencies without unit are in ns
+_ns = {'': 1., 'ps': 1e-3, 'ns': 1., 'us': 1e3, 'ms': 1e6, 's': 1e9}
+_bytes = {'bytes': 1., 'B': 1.}
+
+# Metrics with one value per run (the others have one per component)
+run_metrics = ['instructions', 'cycles', 'ipc', 'sim_time_ns',
+               'l1_mpki', 'l1_hit_rate', 'l2_mpki', 'l2_hit_rate', 'l3_mpki', 'l3_hit_rate',
+               'noc_latency_ns', 'noc_contention_ns', 'memory_read_gbs', 'memory_write_gbs']
+
+def components(runs, roles=None):
+    ''' Components of each role found in the stats of runs: {role: [names]}. '''
+    by_role = {}
+    for c in sorted(set(c for s in runs for c in s)):
+        role = (roles or {}).get(c)
+        if role is None:
+            role = next((r for p, r in name_roles if p.search(c)), None)
+        if role:
+            by_role.setdefault(role, []).append(c)
+    return by_role
+
+def matrix(runs, comps, counter, units=None, reduce=sum):
+    '''
+    Sum (or other reduce) of the counters matching a pattern for each run and
+    component, as an array of shape (len(runs), len(comps)), 0 when absent.
+    The total_* counters are used alone when there are some (see
+    mem_model.counted). With units, a {unit: scale} dict, only counters in
+    these units count, scaled.
+    '''
+    m = np.zeros((len(runs), len(comps)))
+    for i, s in enumerate(runs):
+        for j, c in enumerate(comps):
+            values = dict((name, v * (units[unit] if units else 1.)) for name, (v, unit) in s.get(c, {}).items()
+                          if isinstance(v, (int, float)) and (units is None or unit in units))
+            names = counted(values, counter)
+            if names:
+                m[i, j] = reduce(values[n] for n in names)
+    return m
+
+def _div(a, b):
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    return np.divide(a, b, out=np.full(a.shape, np.nan), where=b != 0)
+
+def derive(runs, roles=None, conversion_factor=1., line_size=64):
+    '''
+    Standard metrics of a list of stats dicts (e.g. [sys.stats for sys in
+    vpsim.IterReadySystems()]), each an array over the runs: the names of
+    run_metrics have shape (runs,), the '..._by_component' ones (runs,
+    components of the role, in the order of m['components'][role]; the
+    memory controllers, or the memories when there are none, for the memory
+    bandwidth). Metrics of a role without components are NaN.
+    Rates without a denominator are NaN too. IPC uses the 'cycles' counters of the
+    cpus, or their simulated time (their largest time counter) times
+    conversion_factor (instructions per ns at an IPC of 1); memory traffic
+    counted in accesses is converted to bytes with line_size.
+    '''
+    if isinstance(runs, dict):
+        runs = [runs]
+    comps = components(runs, roles)
+    m = {'components': comps}
+
+    cpus = comps.get('cpu', [])
+    instr = matrix(runs, cpus, instructions_counter)
+    time_ns = matrix(runs, cpus, time_counter, _ns, reduce=max)
+    cycles = matrix(runs, cpus, cycles_counter)
+    cycles = np.where(cycles > 0, cycles, time_ns * conversion_factor)
+    m['instructions'] = instr.sum(1)
+    m['cycles'] = cycles.max(1) if cpus else np.zeros(len(runs))
+    m['cpu_ipc_by_component'] = _div(instr, cycles)
+    m['ipc'] = _div(m['instructions'], m['cycles'])
+    # Without time counters, the time of the busiest cpu at an IPC of 1
+    sim_time = time_ns.max(1) if cpus else np.zeros(len(runs))
+    if cpus:
+        sim_time = np.where(sim_time > 0, sim_time, instr.max(1) / conversion_factor)
+    m['sim_time_ns'] = sim_time
+
+    kinstr = m['instructions'] / 1000.
+    for lvl in ['l1', 'l2', 'l3']:
+        c = comps.get(lvl, [])
+        miss = matrix(runs, c, miss_counter)
+        acc = matrix(runs, c, access_counter)
+        acc = np.where(acc > 0, acc, matrix(runs, c, hit_counter) + miss)
+        m['%s_misses_by_component' % lvl] = miss
+        m['%s_hit_rate_by_component' % lvl] = 1 - _div(miss, acc)
+        if c:
+            m['%s_mpki' % lvl] = _div(miss.sum(1), kinstr)
+        else:
+            m['%s_mpki' % lvl] = np.full(len(runs), np.nan)
+        m['%s_hit_rate' % lvl] = 1 - _div(miss.sum(1), acc.sum(1))
+
+    noc = comps.get('noc', [])
+    packets = matrix(runs, noc, packet_counter).sum(1)
+    m['noc_latency_ns'] = _div(matrix(runs, noc, latency_counter, _ns).sum(1), packets)
+    m['noc_contention_ns'] = _div(matrix(runs, noc, contention_counter, _ns).sum(1), packets)
+
+    # The memories see the traffic of the controllers again
+    mem = comps.get('memory_controller') or comps.get('memory', [])
+    for kind, counter in [('read', read_counter), ('write', write_counter)]:
+        byte_counts = matrix(runs, mem, counter, _bytes)
+        # Without byte counters, all the counters are access counts
+        accesses = matrix(runs, mem, counter)
+        traffic = np.where(byte_counts > 0, byte_counts, accesses * line_size)
+        # bytes per ns are GB/s
+        m['memory_%s_gbs_by_component' % kind] = _div(traffic, sim_time[:, None])
+        m['memory_%s_gbs' % kind] = _div(traffic.sum(1), sim_time)
+    return m
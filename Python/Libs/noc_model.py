@@ -0,0 +1,201 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import math, random
+import numpy as np
+
+class MeshModel(object):
+    '''
+    Analytic hop/contention model of an XY-routed 2D mesh.
+    Traffic is made of L2 misses sent by the clusters to the L3 home nodes
+    (one request flit, one data packet back) and of L3 misses sent by the
+    home nodes to the memory controllers. Each directed link is modelled
+    as an M/D/1 queue; a placement is scored by the average latency of a
+    packet, in ns.
+    '''
+    def __init__(self, x_nodes, y_nodes, router_latency=0.34, link_latency=0.34,
+            flit_size=8, line_size=64, injection_rate=0.01, l3_miss_rate=0.5):
+        self.x_nodes = x_nodes
+        self.y_nodes = y_nodes
+        self.hop_latency = router_latency + link_latency
+        # A link forwards one flit per cycle of its slowest stage
+        self.flit_time = max(router_latency, link_latency)
+        self.data_flits = 1 + int(math.ceil(float(line_size) / flit_size))
+        self.injection_rate = injection_rate # L2 misses per ns and per cluster
+        self.l3_miss_rate = l3_miss_rate
+
+    @classmethod
+    def from_conf(cls, conf, **kw):
+        noc = conf['memory_subsystem']['noc']
+        return cls(noc['x-nodes'], noc['y-nodes'],
+            router_latency=noc['router-latency-ns'],
+            link_latency=noc['link-latency-ns'],
+            flit_size=noc['flit-size'],
+            line_size=conf['memory_subsystem']['cache']['l3']['line-size'],
+            **kw)
+
+    def __flows(self, clusters, home_nodes, mcs, traffic, hn_spread):
+        c = np.asarray(clusters, dtype=int).reshape(-1, 2)
+        h = np.asarray(home_nodes, dtype=int).reshape(-1, 2)
+        m = np.asarray(mcs, dtype=int).reshape(-1, 2)
+        if traffic is None:
+            traffic = np.full((len(c), len(h)), self.injection_rate / len(h))
+        traffic = np.asarray(traffic, dtype=float)
+        if hn_spread is None:
+            hn_spread = np.full((len(h), len(m)), 1. / len(m)) if len(m) else np.zeros((len(h), 0))
+        to_mc = traffic.sum(axis=0)[:, None] * self.l3_miss_rate * hn_spread
+        ci, hi = np.indices(traffic.shape)
+        hj, mj = np.indices(to_mc.shape)
+        # Requests are one flit, responses carry a cache line
+        src = np.concatenate([c[ci.ravel()], h[hi.ravel()], h[hj.ravel()], m[mj.ravel()]])
+        dst = np.concatenate([h[hi.ravel()], c[ci.ravel()], m[mj.ravel()], h[hj.ravel()]])
+        rate = np.concatenate([traffic.ravel(), traffic.ravel(), to_mc.ravel(), to_mc.ravel()])
+        flits = np.concatenate([np.ones(traffic.size), np.full(traffic.size, self.data_flits),
+                                np.ones(to_mc.size), np.full(to_mc.size, self.data_flits)])
+        return src, dst, rate, flits
+
+    def link_loads(self, src, dst, load):
+        '''
+        Accumulate the load of every XY route on the directed links.
+        Returns (east, west, north, south) arrays: east[y, x] is the link from
+        (x, y) to (x+1, y), north[x, y] the link from (x, y) to (x, y+1).
+        '''
+        X, Y = self.x_nodes, self.y_nodes
+        sx, sy, dx, dy = src[:, 0], src[:, 1], dst[:, 0], dst[:, 1]
+        def segment(sel, rows, lo, hi, n_rows, n):
+            # difference array along each row, integrated with a cumsum
+            d = np.zeros((n_rows, n + 1))
+            np.add.at(d, (rows[sel], lo[sel]), load[sel])
+            np.add.at(d, (rows[sel], hi[sel]), -load[sel])
+            return np.cumsum(d, axis=1)[:, :n - 1]
+        # X first, along the source row, then Y along the destination column
+        east = segment(dx > sx, sy, sx, dx, Y, X)
+        west = segment(dx < sx, sy, dx, sx, Y, X)
+        north = segment(dy > sy, dx, sy, dy, X, Y)
+        south = segment(dy < sy, dx, dy, sy, X, Y)
+        return east, west, north, south
+
+    def evaluate(self, clusters, home_nodes, mcs, traffic=None, hn_spread=None):
+        '''
+        Score a placement given as lists of (x, y) positions.
+        traffic is an optional (clusters x home nodes) matrix of L2 misses per
+        ns, e.g. measured with the NoC diagnosis stats; by default every
+        cluster spreads injection_rate evenly over the home nodes, as SLC
+        interleaving does. hn_spread is the (home nodes x controllers)
+        fraction of L3 misses sent to each controller, even by default
+        (memory interleaving), see address_spread() otherwise.
+        '''
+        src, dst, rate, flits = self.__flows(clusters, home_nodes, mcs, traffic, hn_spread)
+        util = [l * self.flit_time for l in self.link_loads(src, dst, rate * flits)]
+        saturated = max(u.max() if u.size else 0. for u in util) >= 1.
+        # M/D/1 waiting time of each link, then summed along every route
+        # with prefix sums over rows and columns
+        wait = [np.where(u < 1., u / (2 * (1 - np.minimum(u, 0.999))), np.inf) * self.flit_time for u in util]
+        pe, pw, pn, ps = [np.concatenate([np.zeros((w.shape[0], 1)), np.cumsum(w, axis=1)], axis=1) for w in wait]
+        sx, sy, dx, dy = src[:, 0], src[:, 1], dst[:, 0], dst[:, 1]
+        contention = np.where(dx > sx, pe[sy, np.maximum(dx, sx)] - pe[sy, np.minimum(dx, sx)], 0) \
+                   + np.where(dx < sx, pw[sy, np.maximum(dx, sx)] - pw[sy, np.minimum(dx, sx)], 0) \
+                   + np.where(dy > sy, pn[dx, np.maximum(dy, sy)] - pn[dx, np.minimum(dy, sy)], 0) \
+                   + np.where(dy < sy, ps[dx, np.maximum(dy, sy)] - ps[dx, np.minimum(dy, sy)], 0)
+        hops = np.abs(dx - sx) + np.abs(dy - sy)
+        weights = rate / rate.sum()
+        return {
+            'latency_ns': np.inf if saturated else float(np.dot(weights, hops * self.hop_latency + contention)),
+            'hops': float(np.dot(weights, hops)),
+            'max_link_utilization': float(max(u.max() if u.size else 0. for u in util)),
+        }
+
+def address_spread(home_nodes, mcs):
+    '''
+    Fraction of the address slice of each home node served by each memory
+    controller, for platforms without memory interleaving.
+    Both arguments are lists of (base, size, position) as in the conf.
+    '''
+    spread = np.zeros((len(home_nodes), len(mcs)))
+    for i, (hb, hs, _) in enumerate(home_nodes):
+        for j, (mb, ms, _) in enumerate(mcs):
+            spread[i, j] = max(0, min(hb + hs, mb + ms) - max(hb, mb)) / float(hs)
+    return spread
+
+def optimize(model, clusters, home_nodes, mcs, traffic=None, hn_spread=None,
+        hn_candidates=None, mc_candidates=None, iterations=2000, top_k=5, seed=None):
+    '''
+    Search home-node and memory-controller positions with simulated annealing.
+    home_nodes and mcs are the initial positions. Home nodes may move to any
+    tile of hn_candidates (the whole mesh by default); memory controllers
+    only move when mc_candidates is given (e.g. the edge tiles).
+    Returns the top_k distinct placements, best first, as dicts holding the
+    model scores and the 'home-nodes' and 'memory-controllers' positions.
+    '''
+    rnd = random.Random(seed)
+    tiles = [(x, y) for x in range(model.x_nodes) for y in range(model.y_nodes)]
+    groups = [list(map(tuple, home_nodes)), list(map(tuple, mcs))]
+    candidates = [hn_candidates if hn_candidates is not None else tiles, mc_candidates or []]
+    candidates = [list(dict.fromkeys(map(tuple, c))) for c in candidates]
+    movable = [g for g in range(2) if len(candidates[g]) > len(groups[g])]
+    # Without traffic nor hn_spread, all home nodes (and controllers) play
+    # the same role: permutations of the same tiles are one placement
+    symmetric = traffic is None and hn_spread is None
+
+    def score(state):
+        return model.evaluate(clusters, state[0], state[1], traffic, hn_spread)
+
+    def placement(state):
+        return tuple(tuple(sorted(g)) if symmetric else tuple(g) for g in state)
+
+    cur = [list(g) for g in groups]
+    cur_score = score(cur)
+    seen = {placement(cur): cur_score}
+    # 5% of the initial latency, kept positive for exp(-delta / t)
+    t0 = t = max((cur_score['latency_ns'] if np.isfinite(cur_score['latency_ns']) else 1.) * 0.05, 1e-3)
+    for it in range(iterations if movable else 0):
+        g = rnd.choice(movable)
+        new = [list(cur[0]), list(cur[1])]
+        i = rnd.randrange(len(new[g]))
+        new[g][i] = rnd.choice([p for p in candidates[g] if p not in new[g]])
+        key = placement(new)
+        if key not in seen:
+            seen[key] = score(new)
+        delta = seen[key]['latency_ns'] - cur_score['latency_ns']
+        if delta <= 0 or (np.isfinite(delta) and rnd.random() < math.exp(-delta / t)):
+            cur, cur_score = new, seen[key]
+        t = t0 * (1e-3 ** (float(it + 1) / iterations))
+
+    best = sorted(seen.items(), key=lambda kv: kv[1]['latency_ns'])[:top_k]
+    return [dict(s, **{'home-nodes': list(k[0]), 'memory-controllers': list(k[1])}) for k, s in best]
+
+def apply_placement(conf, placement):
+    ''' Move the home nodes and memory controllers of conf to a placement returned by optimize(). '''
+    ms = conf['memory_subsystem']
+    ms['cache']['l3']['home-nodes'] = [(b, sz, pos) for (b, sz, _), pos in
+        zip(ms['cache']['l3']['home-nodes'], placement['home-nodes'])]
+    ms['off-chip-memory']['memory-controllers'] = [(b, sz, pos) for (b, sz, _), pos in
+        zip(ms['off-chip-memory']['memory-controllers'], placement['memory-controllers'])]
+    return conf
+
+def optimize_conf(conf, **kw):
+    ''' Run optimize() on the clusters, home nodes and memory controllers of a FullSystem conf. '''
+    ms = conf['memory_subsystem']
+    model = MeshModel.from_conf(conf)
+    hn_spread = None
+    if not ms['off-chip-memory'].get('interleave_step', 1):
+        hn_spread = address_spread(ms['cache']['l3']['home-nodes'], ms['off-chip-memory']['memory-controllers'])
+    kw.setdefault('hn_spread', hn_spread)
+    return optimize(model,
+        [pos for _, pos in conf['cpu']['cpu_clusters']],
+        [pos for _, _, pos in ms['cache']['l3']['home-nodes']],
+        [pos for _, _, pos in ms['off-chip-memory']['memory-controllers']],
+        **kw)
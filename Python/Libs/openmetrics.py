@@ -0,0 +1,211 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import math, os, re, threading, time
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from vpstats import parseStats, roi_log, sampled_region, totals
+
+# OpenMetrics text exposition of the queued, running and finished runs of
+# this process: state, progress, host resource use and the key counters of
+# the final stats. Everything is read from the System objects and the run
+# directories when the metrics are rendered, in the exporter's thread or on
+# scrape; the simulations themselves are not touched.
+
+# Final stats exported as vpsim_stat, as (component, counter) patterns
+key_counters = [
+    (re.compile(r'cache', re.I), re.compile(r'miss(?!.*(rate|ratio))', re.I)),
+    (re.compile(r'network_on_chip|noc', re.I), re.compile(r'contention|delay', re.I)),
+    (re.compile(r'ram|mem|ddr|controller', re.I), re.compile(r'read|write', re.I)),
+    (re.compile(r'^host$'), re.compile(r'mips')),
+]
+
+_states = ['queued', 'running', 'done', 'failed']
+
+def _number(v):
+    v = float(v)
+    if math.isnan(v):
+        return 'NaN'
+    if math.isinf(v):
+        return '+Inf' if v > 0 else '-Inf'
+    return repr(v)
+
+def _escape(v):
+    return str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return '{%s}' % ','.join('%s="%s"' % (k, _escape(v)) for k, v in sorted(labels.items()))
+
+# Totals of the ROI logs already parsed, {working_dir: {file: (size, totals)}};
+# render() drops the runs that are no longer running
+_roi_cache = {}
+
+def progress(working_dir):
+    '''
+    Progress of a running simulation from the logs it has written so far:
+    (number of regions of interest dumped, counted as in System.rois, and
+    the executed_instructions of all the regions, sampled ones included).
+    '''
+    rois = instr = 0
+    cache = _roi_cache.setdefault(working_dir, {})
+    try:
+        files = os.listdir(working_dir)
+    except OSError:
+        return rois, instr
+    for f in files:
+        t = roi_log.match(f)
+        if not t:
+            continue
+        path = os.path.join(working_dir, f)
+        try:
+            size = os.path.getsize(path)
+            if cache.get(f, (None,))[0] != size:
+                cache[f] = (size, totals(parseStats(path)))
+        except OSError:
+            continue
+        if not sampled_region.search(t.group(1)):
+            rois += 1
+        instr += cache[f][1].get('executed_instructions', 0)
+    return rois, instr
+
+def _runs(systems):
+    if systems is None:
+        import vpsim
+        systems = vpsim._all_known_sys
+    return [(i, s) for i, s in enumerate(systems) if getattr(s, 'state', 'defined') != 'defined']
+
+def render(systems=None):
+    ''' OpenMetrics text for the runs of systems (default: all the Systems of this process). '''
+    runs = _runs(systems)
+    now = time.time()
+    families = {}
+    def add(name, kind, doc, labels, value, suffix=''):
+        fam = families.setdefault(name, (kind, doc, []))
+        fam[2].append('%s%s%s %s' % (name, suffix, _labels(**labels), _number(value)))
+
+    for state in _states:
+        add('vpsim_runs', 'gauge', 'Runs by state.', {'state': state},
+            len([1 for _, s in runs if s.state == state]))
+    for i, s in runs:
+        run = {'system': s.name, 'id': i}
+        add('vpsim_run', 'info', 'Runs and their state.',
+            dict(run, state=s.state, dir=os.path.basename(s.working_dir or '')), 1, '_info')
+        if s.started:
+            add('vpsim_run_elapsed_seconds', 'gauge', 'Wall time since the run started.', run,
+                (s.finished or now) - s.started)
+        if s.state == 'running' and s.working_dir:
+            rois, instr = progress(s.working_dir)
+        elif s.state in ['done', 'failed']:
+            rois = len(s.rois)
+            instr = totals(s.stats).get('executed_instructions', 0)
+        else:
+            continue
+        add('vpsim_run_rois', 'gauge', 'Regions of interest dumped.', run, rois)
+        add('vpsim_run_instructions', 'gauge', 'Simulated instructions (of the regions dumped so far while running).', run, instr)
+        samples = (s.telemetry or {}).get('samples')
+        if samples:
+            last = samples[-1]
+            for mode in ['user', 'system']:
+                add('vpsim_host_cpu_seconds', 'counter', 'Host CPU time of the simulator.',
+                    dict(run, mode=mode), last['cpu_' + mode], '_total')
+            add('vpsim_host_rss_bytes', 'gauge', 'Resident memory of the simulator.', run, last['rss'])
+            add('vpsim_host_threads', 'gauge', 'Threads of the simulator.', run, last['threads'])
+            for kind in ['voluntary', 'nonvoluntary']:
+                add('vpsim_host_context_switches', 'counter', 'Context switches of the simulator threads.',
+                    dict(run, kind=kind), last['%s_ctxt_switches' % kind], '_total')
+            for direction in ['read', 'write']:
+                if '%s_bytes' % direction in last:
+                    add('vpsim_host_io_bytes', 'counter', 'Storage I/O of the simulator.',
+                        dict(run, direction=direction), last['%s_bytes' % direction], '_total')
+        if s.state == 'done':
+            for comp in sorted(s.stats):
+                for counter, (v, unit) in sorted(s.stats[comp].items()):
+                    if isinstance(v, (int, float)) and any(c.search(comp) and n.search(counter) for c, n in key_counters):
+                        add('vpsim_stat', 'gauge', 'Key counters of the final stats.',
+                            dict(run, component=comp, counter=counter, unit=unit), v)
+    running = set(s.working_dir for _, s in runs if s.state == 'running')
+    for d in list(_roi_cache):
+        if d not in running:
+            _roi_cache.pop(d, None)
+
+    out = []
+    for name in sorted(families):
+        kind, doc, samples = families[name]
+        out.append('# TYPE %s %s' % (name, kind))
+        out.append('# HELP %s %s' % (name, doc))
+        out += samples
+    out.append('# EOF')
+    return '\n'.join(out) + '\n'
+
+def write(path, systems=None):
+    ''' Write the metrics to a file atomically (e.g. for the node_exporter textfile collector). '''
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'w') as f:
+        f.write(render(systems))
+    os.replace(tmp, path)
+
+class Exporter(object):
+    '''
+    Export the metrics of systems (default: all the Systems of this process)
+    to a file rewritten every `interval` seconds, and/or over HTTP on
+    host:port (any path, rendered on each scrape). Runs in daemon threads.
+    '''
+    def __init__(self, path=None, port=None, host='127.0.0.1', interval=15, systems=None):
+        self.path = path
+        self.interval = interval
+        self.systems = systems
+        self.server = None
+        self.__stop = threading.Event()
+        self.__threads = []
+        if path:
+            self.__start(self.__writer)
+        if port is not None:
+            exporter = self
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    body = render(exporter.systems).encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/openmetrics-text; version=1.0.0; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                def log_message(self, *args):
+                    pass
+            self.server = ThreadingHTTPServer((host, port), Handler)
+            self.server.daemon_threads = True
+            self.__start(self.server.serve_forever)
+
+    def __start(self, target):
+        t = threading.Thread(target=target, daemon=True)
+        t.start()
+        self.__threads.append(t)
+
+    def __writer(self):
+        while True:
+            write(self.path, self.systems)
+            if self.__stop.wait(self.interval):
+                break
+
+    def stop(self):
+        ''' Stop exporting; the file gets a last update. '''
+        self.__stop.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        for t in self.__threads:
+            t.join()
+        if self.path:
+            write(self.path, self.systems)
@@ -0,0 +1,76 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os, struct
+
+QCOW_MAGIC = b'QFI\xfb'
+CLUSTER_BITS = 16
+CLUSTER_SIZE = 1 << CLUSTER_BITS
+EXT_BACKING_FORMAT = 0xE2792ACA
+
+def image_info(path):
+    ''' Return (format, virtual size in bytes) of a raw or qcow2 image. '''
+    with open(path, 'rb') as f:
+        head = f.read(32)
+    if head[:4] == QCOW_MAGIC:
+        return 'qcow2', struct.unpack('>Q', head[24:32])[0]
+    return 'raw', os.path.getsize(path)
+
+def create_overlay(path, backing):
+    '''
+    Write an empty qcow2 (version 2) image backed by the image at backing.
+    Reads of unallocated clusters go to the backing image, which QEMU only
+    opens read-only; writes stay in the overlay. The file is written next
+    to path and renamed, so a partially written overlay is never visible.
+    Layout: header, refcount table, refcount block, then the L1 table.
+    '''
+    backing = os.path.abspath(backing)
+    fmt, size = image_info(backing)
+    l2_coverage = CLUSTER_SIZE * (CLUSTER_SIZE // 8)
+    l1_size = max(1, (size + l2_coverage - 1) // l2_coverage)
+    l1_clusters = (l1_size * 8 + CLUSTER_SIZE - 1) // CLUSTER_SIZE
+    n_clusters = 3 + l1_clusters
+    if n_clusters > CLUSTER_SIZE // 2:
+        raise Exception("Backing image %s is too large for a single refcount block." % backing)
+
+    name = backing.encode()
+    ext_fmt = fmt.encode()
+    exts = struct.pack('>II', EXT_BACKING_FORMAT, len(ext_fmt)) + ext_fmt + b'\0' * (-len(ext_fmt) % 8)
+    exts += struct.pack('>II', 0, 0)
+    backing_offset = 72 + len(exts)
+    if backing_offset + len(name) > CLUSTER_SIZE:
+        raise Exception("Backing file name too long: %s" % backing)
+
+    header = struct.pack('>4sIQIIQIIQQIIQ',
+        QCOW_MAGIC, 2,
+        backing_offset, len(name),
+        CLUSTER_BITS, size,
+        0,                      # no encryption
+        l1_size, 3 * CLUSTER_SIZE,
+        1 * CLUSTER_SIZE, 1,    # refcount table: one cluster
+        0, 0)                   # no snapshots
+    cluster0 = header + exts + name
+    refcount_table = struct.pack('>Q', 2 * CLUSTER_SIZE)
+    refcount_block = struct.pack('>%dH' % n_clusters, *([1] * n_clusters))
+
+    tmp = '%s.%s.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(cluster0.ljust(CLUSTER_SIZE, b'\0'))
+        f.write(refcount_table.ljust(CLUSTER_SIZE, b'\0'))
+        f.write(refcount_block.ljust(CLUSTER_SIZE, b'\0'))
+        f.write(b'\0' * (l1_clusters * CLUSTER_SIZE))
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,130 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os, json, time
+
+from vpstats import totals
+
+# Quantum values tried by default, from the most accurate to the fastest
+default_ladder = [1000, 4096, 16384, 65535]
+
+def default_path():
+    return os.path.join(os.getenv('VPSIM_HOME', '.'), 'bin', 'quantum.json')
+
+def drift(reference, stats, counters=None, min_value=100):
+    '''
+    Largest relative difference between the counter totals of two runs
+    (host and run sections excluded, see vpstats.totals).
+    Only counters listed in counters (all by default) whose reference total
+    is at least min_value are compared. Returns (drift, counter).
+    '''
+    ref, tot = totals(reference), totals(stats)
+    worst = (0., None)
+    for c in (counters or ref):
+        if c in ref and abs(ref[c]) >= min_value:
+            d = abs(tot.get(c, 0) - ref[c]) / float(abs(ref[c]))
+            if d > worst[0]:
+                worst = (d, c)
+    return worst
+
+def run_ladder(make_system, quanta=default_ladder, counters=None):
+    '''
+    Simulate a short reference workload once per quantum value.
+    make_system(quantum) must return a System (e.g. a FullSystem whose conf
+    has conf['cpu']['quantum'] = quantum) whose workload ends the simulation
+    by itself, e.g. with 'sesam quit'.
+    Returns one dict per quantum with the host wall time, the guest MIPS and
+    the drift of the stats against the smallest quantum.
+    '''
+    results = []
+    for q in sorted(quanta):
+        sys = make_system(q)
+        start = time.time()
+        stats = sys.build(simulate=True, wait=True, silent=True)
+        wall = time.time() - start
+        instr = totals(stats).get('executed_instructions', 0)
+        results.append({
+            'quantum': q,
+            'wall_s': wall,
+            'instructions': instr,
+            'mips': instr / wall / 1e6 if wall > 0 else 0.,
+            'stats': stats,
+        })
+    for r in results:
+        r['drift'], r['worst_counter'] = drift(results[0]['stats'], r['stats'], counters)
+    return results
+
+def recommend(results, budget):
+    '''
+    Largest quantum of a ladder such that the stats drift of it and of every
+    smaller quantum stays within budget (relative): a noisy ladder does not
+    go past the first quantum that breaks it.
+    '''
+    best = None
+    for r in sorted(results, key=lambda r: r['quantum']):
+        if r['drift'] > budget:
+            break
+        best = r['quantum']
+    return best if best is not None else min(r['quantum'] for r in results)
+
+def save(cores, quantum, budget, results=None, path=None):
+    ''' Record the quantum to use for platforms with this number of cores. '''
+    path = path or default_path()
+    table = load(path)
+    table[str(cores)] = {
+        'quantum': quantum,
+        'budget': budget,
+        'ladder': [dict((k, r[k]) for k in ['quantum', 'mips', 'drift', 'worst_counter'])
+                   for r in (results or [])],
+    }
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(table, f, indent=2)
+    os.replace(tmp, path)
+
+def load(path=None):
+    path = path or default_path()
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def lookup(cores, path=None):
+    '''
+    Calibrated quantum for a number of cores: the entry of that platform
+    size, or of the closest calibrated size (with a warning). None when
+    nothing was calibrated.
+    '''
+    table = load(path)
+    if not table:
+        return None
+    best = min(table, key=lambda k: abs(int(k) - cores))
+    if int(best) != cores:
+        print("Warning: no quantum calibrated for %d cores, using the one of %s cores." % (cores, best))
+    return table[best]['quantum']
+
+def calibrate(make_system, cores, budget=0.02, quanta=default_ladder, counters=None, apply=True, path=None):
+    '''
+    Run the ladder, pick the largest quantum within the error budget and,
+    if apply is set, record it so that conf['cpu']['quantum'] = 'auto'
+    uses it for platforms of this size.
+    Returns (quantum, results).
+    '''
+    results = run_ladder(make_system, quanta, counters)
+    q = recommend(results, budget)
+    if apply:
+        save(cores, q, budget, results, path)
+    return q, results
@@ -0,0 +1,202 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os, math, threading
+from statistics import NormalDist
+
+from vpstats import parseRois, parseStats, roi_log, totals
+
+# Sampled (SMARTS-like) simulation.
+# In the guest, 'sesam smarts <period-ms> <window-ms> <warmup-ms> <app>'
+# runs the application in functional fast-forward (no detailed memory
+# simulation when 'focus_on_roi' is set) and, every period, opens a
+# detailed warm-up region followed by a measured window. The Monitor dumps
+# each window as sesamBench_<app>@w_<n>.log and each warm-up region as
+# sesamBench_<app>@warmup_<n>.log, which is ignored here.
+
+def smarts_command(app, period_ms, window_ms, warmup_ms=0):
+    ''' Guest command line running app with periodic detailed windows. '''
+    if window_ms + warmup_ms > period_ms:
+        raise Exception("Warm-up and window must fit within the sampling period.")
+    return 'sesam smarts %d %d %d %s' % (period_ms, window_ms, warmup_ms, app)
+
+def windows(working_dir, app):
+    ''' Stats of each detailed window of app in a run directory, in order. '''
+    region = '%s@w' % os.path.basename(app.split()[0])
+    return [r['stats'] for r in parseRois(working_dir, sampled=True) if r['app'] == region]
+
+# Student t quantiles for 1 to 10 degrees of freedom, where the expansion
+# below is too far off (9.7 instead of 12.7 at 1 dof and p = 0.975)
+_t_table = {
+    0.9: [3.078, 1.886, 1.638, 1.533, 1.476, 1.440, 1.415, 1.397, 1.383, 1.372],
+    0.95: [6.314, 2.920, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833, 1.812],
+    0.975: [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228],
+    0.995: [63.657, 9.925, 5.841, 4.604, 4.032, 3.707, 3.499, 3.355, 3.250, 3.169],
+}
+
+def _t_quantile(p, dof):
+    if dof <= 0:
+        return float('inf')
+    # Closed forms at 1 and 2 dof
+    if dof == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if dof == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    for q, t in _t_table.items():
+        if abs(p - q) < 1e-9 and dof <= len(t):
+            return t[dof - 1]
+    # Cornish-Fisher expansion of the Student t quantile around the normal one
+    z = NormalDist().inv_cdf(p)
+    return z + (z**3 + z) / (4. * dof) \
+             + (5*z**5 + 16*z**3 + 3*z) / (96. * dof**2) \
+             + (3*z**7 + 19*z**5 + 17*z**3 - 15*z) / (384. * dof**3)
+
+def aggregate(samples, confidence=0.95):
+    '''
+    Mean of every counter over the windows with its confidence interval.
+    Returns {component: {counter: (mean, half_width, unit)}}; half_width is
+    infinite with a single window.
+    '''
+    values = {}
+    for s in samples:
+        for comp in s:
+            for counter, (v, unit) in s[comp].items():
+                if isinstance(v, (int, float)):
+                    values.setdefault(comp, {}).setdefault(counter, ([], unit))[0].append(v)
+    n = len(samples)
+    t = _t_quantile(1 - (1 - confidence) / 2., n - 1)
+    agg = {}
+    for comp in values:
+        agg[comp] = {}
+        for counter, (v, unit) in values[comp].items():
+            # windows missing a counter count as zero
+            v = v + [0] * (n - len(v))
+            mean = sum(v) / float(n)
+            var = sum((x - mean)**2 for x in v) / (n - 1) if n > 1 else float('inf')
+            agg[comp][counter] = (mean, t * math.sqrt(var / n), unit)
+    return agg
+
+def extrapolate(agg, n_windows_equivalent):
+    '''
+    Scale per-window means and intervals to a whole-run estimate, e.g. with
+    run_length / window_length windows.
+    '''
+    return dict((comp, dict((c, (m * n_windows_equivalent, h * n_windows_equivalent, u))
+                            for c, (m, h, u) in agg[comp].items())) for comp in agg)
+
+# Periodic sampling: 'sesam sample <N>ms|<N>insn <app>' dumps back-to-back
+# regions of one interval each as sesamBench_<app>@sample_<n>.log.
+
+def sample_command(app, interval_ms=None, instructions=None):
+    ''' Guest command line sampling app every interval_ms or every N instructions. '''
+    if (interval_ms is None) == (instructions is None):
+        raise Exception("Give either a sampling interval in ms or in instructions.")
+    return 'sesam sample %s %s' % ('%dms' % interval_ms if interval_ms else '%dinsn' % instructions, app)
+
+def timeseries(working_dir, app):
+    '''
+    Counters of each 'sesam sample' interval of app as NumPy arrays (one
+    value per interval, 0 when an interval lacks the counter):
+    {component: {counter: array}}. Values are per interval, use cumsum()
+    for running totals.
+    '''
+    import numpy as np
+    region = '%s@sample' % os.path.basename(app.split()[0])
+    samples = [r['stats'] for r in parseRois(working_dir, sampled=True) if r['app'] == region]
+    series = {}
+    for i, s in enumerate(samples):
+        for comp in s:
+            for counter, (v, _) in s[comp].items():
+                if isinstance(v, (int, float)):
+                    series.setdefault(comp, {}).setdefault(counter, np.zeros(len(samples)))[i] = v
+    return series
+
+class EarlyStop(object):
+    '''
+    Stop a run once its 'sesam sample' intervals have converged: every
+    metric stays within a relative tolerance of its mean over the last
+    `window` intervals (and at least min_intervals were simulated).
+    metrics maps names to a counter name (summed over the components) or to
+    a function of the stats of an interval, e.g.
+    {'l1_miss': lambda s: mem_model.miss_ratios(s)['l1'] or 0}.
+    Add it to system.run_watchers; the run is ended with system.stop(),
+    which runs 'sesam quit' on the guest console (a UART with 'console':
+    'socket' is required, the run is never killed), and its 'run' stats
+    record truncation_reason. values holds the metrics of each interval
+    seen.
+    '''
+    def __init__(self, app, metrics, tolerance=0.02, window=5, min_intervals=0, poll=1.0, grace=60):
+        self.region = '%s@sample' % os.path.basename(app.split()[0])
+        self.metrics = metrics
+        self.tolerance = tolerance
+        self.window = window
+        self.min_intervals = min_intervals
+        self.poll = poll
+        self.grace = grace
+        self.values = []
+        self.reason = None
+        self.__stop = threading.Event()
+        self.__thread = None
+
+    def _metric(self, m, stats):
+        if callable(m):
+            return float(m(stats))
+        return float(totals(stats).get(m, 0))
+
+    def converged(self):
+        ''' The reason to stop after the intervals seen so far, or None. '''
+        n = len(self.values)
+        if n < max(self.window, self.min_intervals, 2):
+            return None
+        last = self.values[-self.window:]
+        for name in self.metrics:
+            v = [x[name] for x in last]
+            mean = sum(v) / len(v)
+            if max(abs(x - mean) for x in v) > self.tolerance * abs(mean):
+                return None
+        return '%s within %g%% over %d intervals after %d intervals' % (
+            ', '.join(sorted(self.metrics)), self.tolerance * 100, len(last), n)
+
+    def start(self, system):
+        self.values = []
+        self.reason = None
+        self.__stop.clear()
+        self.__thread = threading.Thread(target=self.__watch, args=(system,), daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        if self.__thread:
+            self.__thread.join()
+
+    def __watch(self, system):
+        seen = 0
+        while not self.__stop.wait(self.poll):
+            seqs = []
+            for f in os.listdir(system.working_dir):
+                t = roi_log.match(f)
+                if t and t.group(1) == self.region:
+                    seqs.append((int(t.group(2)), f))
+            # The last log may still be being written
+            ready = sorted(seqs)[:-1]
+            for _, f in ready[seen:]:
+                stats = parseStats(os.path.join(system.working_dir, f))
+                self.values.append(dict((name, self._metric(m, stats)) for name, m in self.metrics.items()))
+            seen = max(seen, len(ready))
+            self.reason = self.converged()
+            if self.reason:
+                system.stop('converged: %s' % self.reason, self.grace)
+                break
@@ -0,0 +1,164 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os, re, sys, json, argparse
+from fnmatch import fnmatchcase
+
+from vpstats import parseStats, loadStats, saveStats, roi_log, run_sections
+
+# Compare two sets of stats, e.g. the golden stats of a reference workload
+# and those of the same workload after a vpsim, QEMU or kernel upgrade:
+#   python3 statsdiff.py golden.json <run dir> [--rel 'dcacheL*.*=0.01'] ...
+# Counters are summed per component type (dcacheL1_0, dcacheL1_1, ... are
+# dcacheL1) unless --per-component is given. Any counter moving beyond its
+# thresholds is a regression, and the exit status is 1.
+
+# Not part of the simulated behaviour
+default_ignore = ['%s.*' % s for s in run_sections]
+
+def load(path):
+    '''
+    Stats of a stats.json file, a VPSim .log file, or a run directory (its
+    stats.json, or else its whole-run .log files).
+    '''
+    if os.path.isdir(path):
+        if os.path.exists(os.path.join(path, 'stats.json')):
+            return loadStats(os.path.join(path, 'stats.json'))
+        stats = {}
+        for f in sorted(os.listdir(path)):
+            if f.endswith('.log') and not roi_log.match(f):
+                parseStats(os.path.join(path, f), stats)
+        return stats
+    if path.endswith('.log'):
+        return parseStats(path)
+    return loadStats(path)
+
+def component_type(comp):
+    ''' Type of a component: its name without the instance index. '''
+    return re.sub(r'[_-]?\d+$', '', comp)
+
+def group(stats, per_component=False):
+    ''' {group: {counter: value}} of the numeric counters, summed per component type. '''
+    groups = {}
+    for comp in stats:
+        g = comp if per_component else component_type(comp)
+        for counter, v in stats[comp].items():
+            if isinstance(v[0], (int, float)) and not isinstance(v[0], bool):
+                groups.setdefault(g, {})[counter] = groups.get(g, {}).get(counter, 0) + v[0]
+    return groups
+
+def threshold(name, rules):
+    '''
+    (relative, absolute) threshold of a 'group.counter' name, or None when
+    it is ignored. rules are dicts {'match': glob, 'rel': r, 'abs': a,
+    'ignore': bool}; each matching rule overrides the fields it gives. A
+    change within either threshold is not a regression; by default any
+    change is.
+    '''
+    t = {'rel': 0., 'abs': 0., 'ignore': False}
+    for r in rules:
+        if fnmatchcase(name, r['match']):
+            t.update((k, r[k]) for k in t if k in r)
+    return None if t['ignore'] else (t['rel'], t['abs'])
+
+def diff(old, new, rules=(), per_component=False):
+    '''
+    Compare two stats dicts counter by counter. Returns one row per counter
+    of either side: {'group', 'counter', 'old', 'new', 'delta', 'rel',
+    'regression'}; a counter missing on one side is a regression.
+    '''
+    rules = [{'match': p, 'ignore': True} for p in default_ignore] + list(rules)
+    a = group(old, per_component)
+    b = group(new, per_component)
+    rows = []
+    for g in sorted(set(a) | set(b)):
+        for counter in sorted(set(a.get(g, {})) | set(b.get(g, {}))):
+            t = threshold('%s.%s' % (g, counter), rules)
+            if t is None:
+                continue
+            x = a.get(g, {}).get(counter)
+            y = b.get(g, {}).get(counter)
+            row = {'group': g, 'counter': counter, 'old': x, 'new': y, 'delta': None, 'rel': None}
+            if x is None or y is None:
+                row['regression'] = True
+            else:
+                row['delta'] = y - x
+                row['rel'] = (y - x) / float(abs(x)) if x else (0. if y == x else float('inf'))
+                row['regression'] = abs(y - x) > t[1] and abs(row['rel']) > t[0]
+            rows.append(row)
+    return rows
+
+def report(rows, all_counters=False, out=sys.stdout):
+    ''' Print the rows by group: the regressions, or all the counters. '''
+    last = None
+    for r in rows:
+        if not (r['regression'] or all_counters):
+            continue
+        if r['group'] != last:
+            out.write('== %s ==\n' % r['group'])
+            last = r['group']
+        if r['delta'] is None:
+            change = 'only in %s' % ('new' if r['old'] is None else 'old')
+        else:
+            change = '%+g (%+.2f%%)' % (r['delta'], r['rel'] * 100)
+        out.write('  %-40s %14s -> %-14s %s%s\n' % (r['counter'], r['old'], r['new'], change,
+                                                  '  REGRESSION' if r['regression'] else ''))
+
+def _pattern_value(s):
+    pattern, _, value = s.rpartition('=')
+    if not pattern:
+        return '*', float(value)
+    return pattern, float(value)
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description='Compare two sets of VPSim stats and report the counters that moved.')
+    p.add_argument('baseline', help='stats.json, .log file or run directory (e.g. golden stats)')
+    p.add_argument('new', help='stats.json, .log file or run directory')
+    p.add_argument('--rel', action='append', default=[], metavar='[GLOB=]R',
+                   help="relative threshold of the 'group.counter' names matching GLOB (default: any change)")
+    p.add_argument('--abs', action='append', default=[], metavar='[GLOB=]A',
+                   help='absolute threshold of the matching counters')
+    p.add_argument('--ignore', action='append', default=[], metavar='GLOB', help='counters not compared')
+    p.add_argument('--thresholds', help='JSON file with a list of rules {"match": glob, "rel": r, "abs": a, "ignore": bool}')
+    p.add_argument('--per-component', action='store_true', help='compare each component instead of each component type')
+    p.add_argument('--all', action='store_true', help='print all the counters, not only the regressions')
+    p.add_argument('--update', action='store_true', help='save the new stats as the baseline (golden stats) and exit')
+    args = p.parse_args(argv)
+
+    new = load(args.new)
+    if args.update:
+        saveStats(args.baseline, new)
+        print('Saved %d components to %s' % (len(new), args.baseline))
+        return 0
+    rules = []
+    if args.thresholds:
+        with open(args.thresholds) as f:
+            rules += json.load(f)
+    # Command line rules apply after (over) those of the file
+    for kind in ['rel', 'abs']:
+        for s in getattr(args, kind):
+            pattern, v = _pattern_value(s)
+            rules.append({'match': pattern, kind: v})
+    rules += [{'match': g, 'ignore': True} for g in args.ignore]
+
+    rows = diff(load(args.baseline), new, rules, args.per_component)
+    report(rows, args.all)
+    regressions = len([r for r in rows if r['regression']])
+    print('%d counters compared, %d regressions' % (len(rows), regressions))
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os, threading, time
+
+from vpstats import totals
+
+# Host resources used by a running simulator, sampled from /proc/<pid> by a
+# background thread while System.build() waits on the vpsim process.
+
+_tick = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+def _fields(path):
+    ''' key: value lines of /proc/<pid>/status and io '''
+    d = {}
+    with open(path) as f:
+        for line in f:
+            k, _, v = line.partition(':')
+            d[k] = v.split()
+    return d
+
+def readProc(pid):
+    '''
+    One reading of the resources of a process and its threads: CPU times (s),
+    resident and peak resident memory (bytes), context switches (summed over
+    the threads), storage I/O (bytes) and number of threads.
+    '''
+    with open('/proc/%d/stat' % pid) as f:
+        # The command name may contain spaces: fields start after ')'
+        stat = f.read().rsplit(')', 1)[1].split()
+    status = _fields('/proc/%d/status' % pid)
+    s = {
+        'cpu_user': int(stat[11]) / _tick,
+        'cpu_system': int(stat[12]) / _tick,
+        'rss': int(status['VmRSS'][0]) * 1024,
+        'max_rss': int(status['VmHWM'][0]) * 1024,
+        'threads': int(stat[17]),
+        'voluntary_ctxt_switches': 0,
+        'nonvoluntary_ctxt_switches': 0,
+    }
+    # The switches of /proc/<pid>/status are those of the main thread only
+    for tid in os.listdir('/proc/%d/task' % pid):
+        try:
+            t = _fields('/proc/%d/task/%s/status' % (pid, tid))
+        except OSError:
+            continue    # thread exited meanwhile
+        s['voluntary_ctxt_switches'] += int(t['voluntary_ctxt_switches'][0])
+        s['nonvoluntary_ctxt_switches'] += int(t['nonvoluntary_ctxt_switches'][0])
+    try:
+        io = _fields('/proc/%d/io' % pid)
+        s['read_bytes'] = int(io['read_bytes'][0])
+        s['write_bytes'] = int(io['write_bytes'][0])
+    except (OSError, KeyError):
+        pass    # not readable without ptrace rights on some hosts
+    return s
+
+class HostSampler(object):
+    '''
+    Read /proc/<pid> every `interval` seconds until stop(). samples holds one
+    dict per reading, with its 'time' in seconds since the sampler started.
+    The last reading is at most one interval before the process exits.
+    '''
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.start = time.time()
+        self.end = None
+        self.samples = []
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+        self.__thread.start()
+
+    def __run(self):
+        while True:
+            try:
+                s = readProc(self.pid)
+            except (OSError, KeyError, IndexError, ValueError):
+                break   # gone, or no /proc on this host
+            s['time'] = time.time() - self.start
+            self.samples.append(s)
+            if self.__stop.wait(self.interval):
+                break
+
+    def stop(self):
+        self.end = time.time()
+        self.__stop.set()
+        self.__thread.join()
+
+def mipsSeries(start, rois, working_dir):
+    '''
+    Simulated MIPS over time from the regions of interest of a run: the
+    Monitor writes each sesamBench log when its region ends, so each region
+    gives (host time of its end since start, instructions, MIPS over the
+    host time since the previous region ended). Most accurate with the
+    back-to-back regions of 'sesam sample'.
+    '''
+    series = []
+    last = start
+    for roi in rois:
+        try:
+            end = os.path.getmtime(os.path.join(working_dir, roi['file']))
+        except OSError:
+            continue
+        instr = roi['totals'].get('executed_instructions', 0)
+        series.append((end - start, instr, instr / (end - last) / 1e6 if end > last else 0.))
+        last = max(last, end)
+    return series
+
+def summary(sampler, stats):
+    '''
+    'host' stats section of a run, {counter: (value, unit)}: wall and CPU
+    time, memory, context switches and I/O of the simulator, and simulated
+    MIPS from the executed_instructions of the stats.
+    '''
+    wall = (sampler.end or time.time()) - sampler.start
+    host = {'wall_time': (wall, 's')}
+    if sampler.samples:
+        last = sampler.samples[-1]
+        cpu = last['cpu_user'] + last['cpu_system']
+        host['cpu_user'] = (last['cpu_user'], 's')
+        host['cpu_system'] = (last['cpu_system'], 's')
+        host['cpu_utilization'] = (cpu / wall if wall > 0 else 0., 'cpus')
+        host['max_rss'] = (max(s['max_rss'] for s in sampler.samples), 'bytes')
+        host['threads'] = (max(s['threads'] for s in sampler.samples), 'threads')
+        for k in ['voluntary_ctxt_switches', 'nonvoluntary_ctxt_switches']:
+            host[k] = (last[k], 'switches')
+        for k in ['read_bytes', 'write_bytes']:
+            if k in last:
+                host[k] = (last[k], 'bytes')
+    instr = totals(stats).get('executed_instructions', 0)
+    host['mips'] = (instr / wall / 1e6 if wall > 0 else 0., 'MIPS')
+    return host
@@ -16,13 +16,17 @@ limitations under the License.
 
 import os
 import subprocess
-import re
 import threading
 import shutil
+import time
 import copy
 from datetime import datetime
 
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed
+
+from vpstats import parseStats, parseRois, roi_log, saveStats
+from telemetry import HostSampler, mipsSeries, summary
+import journal
 
 _Ex=ThreadPoolExecutor(1)
 
@@ -35,6 +39,40 @@ def SetMaxThreads(mt):
 
 _ActF=[]
 
+# What is kept of a run directory once its stats are parsed:
+# 'all' keeps everything, 'logs' removes the scratch files of the run
+# (e.g. disk image overlays), 'none' removes the whole directory.
+_RunRetention='all'
+
+def SetRunRetention(policy):
+    global _RunRetention
+    if policy not in ['all', 'logs', 'none']:
+        raise Exception("Run retention policy should be one of: all, logs, none")
+    _RunRetention = policy
+
+# Seconds between two readings of the host resources used by a running
+# simulator (see telemetry.py), None to disable the sampler.
+_TelemetryInterval=1.0
+
+def SetTelemetryInterval(interval):
+    global _TelemetryInterval
+    _TelemetryInterval = interval
+
+# Journal of the runs (see journal.py), None when runs are not journaled
+_Journal=None
+
+def SetJournal(path):
+    '''
+    Record the runs in an append-only journal. A driver restarted with the
+    same journal and the same sweep restores the runs already completed
+    (they come out of IterReadySystems() at once) and waits for those still
+    running, instead of simulating them again.
+    '''
+    global _Journal
+    if _Journal:
+        _Journal.close()
+    _Journal = journal.Journal(os.path.abspath(path)) if path else None
+
 def IterReadySystems():
     global _ActF
     t=copy.copy(_ActF)
@@ -248,12 +286,34 @@ class System:
         self.__ips=[]
         self.name=name
         self.config = []
+        # Run description, reported in the 'run' section of the stats
+        self.info = {}
+        # Callables preparing each run directory before the simulation starts,
+        # returning the scratch files they created
+        self.run_setup = []
+        # Objects watching each run while it simulates: start(system) when
+        # the simulator is started, stop() when it exits (e.g. sampling.EarlyStop)
+        self.run_watchers = []
+        # defined, queued, running, done or failed (see openmetrics.py)
+        self.state = 'defined'
+        self.started = self.finished = None
+        self.telemetry = None
+        # Why the last run was stopped early (see stop()), None otherwise
+        self.truncated = None
+        self.__aborted = False
+        # Key of the last run in the journal (see SetJournal())
+        self.run_key = None
+        self.__proc = None
         _all_known_sys.append(self)
         newAddressDomain()
 
     def psh(self,ip):
         self.__ips.append(ip)
 
+    def components(self):
+        ''' The component instances of the platform, in creation order. '''
+        return list(self.__ips)
+
     def addParam(self, param):
         if not isinstance(param,Param):
             raise TypeError("addParam() expects a Param object.")
@@ -311,10 +371,20 @@ class System:
                     of.write('\n'.join(buildsets[f]))
 
             if simulate:
+                restored, prev=self.__submit('\n'.join(buildsets[f])+'\n')
                 if wait:
-                    return self.__simulate(buildsets[f], silent, outstream).stats
+                    if restored:
+                        return self.stats
+                    return self.__run(buildsets[f], silent, outstream, prev).stats
+                elif restored:
+                    self.__fut=Future()
+                    self.__fut.set_result(self)
+                    _ActF.append(self.__fut)
                 else:
-                    self.__fut=_Ex.submit(self.__simulate, buildsets[f], silent, outstream)
+                    # Set by the run once its directory exists
+                    self.working_dir=None
+                    self.state='queued'
+                    self.__fut=_Ex.submit(self.__run, buildsets[f], silent, outstream, prev)
                     _ActF.append(self.__fut)
 
     def done(self):
@@ -323,45 +393,179 @@ class System:
     def waitStats(self):
         return self.__fut.result().stats
 
+    def __submit(self, xml):
+        '''
+        Journal the submission of a run. Returns (restored, prev): restored
+        is True when the journal holds its result from an earlier driver,
+        which is restored instead; prev is the last record of the run.
+        '''
+        self.run_key=None
+        if not _Journal:
+            return False, None
+        self.run_key=_Journal.key(xml)
+        prev=_Journal.get(self.run_key)
+        if prev and prev['event'] == 'completed' and prev.get('state') == 'done':
+            stats=journal.result(prev)
+            if stats is not None:
+                self.stats=stats
+                self.working_dir=prev.get('working_dir')
+                self.rois=parseRois(self.working_dir) if self.working_dir and os.path.isdir(self.working_dir) else []
+                self.telemetry=None
+                self.truncated=None
+                self.state='done'
+                return True, prev
+        _Journal.record('submitted', self.run_key, name=self.name)
+        return False, prev
+
+    def __run(self, bs, silent, outstream, prev=None):
+        if prev and prev['event'] == 'running' and journal.alive(prev):
+            # Left running by an earlier driver: wait for it to end
+            self.working_dir=prev['working_dir']
+            self.truncated=None
+            self.telemetry=None
+            self.state='running'
+            self.started=prev['time']
+            while journal.alive(prev):
+                time.sleep(1)
+            # Its exit status is lost: judge it from what it left
+            return self.__collect(self.working_dir, [], None, None)
+        return self.__simulate(bs, silent, outstream)
+
     def __simulate(self, bs, silent, outstream):
         dateTime = datetime.now().isoformat(timespec='seconds')
         working_dir='.%s%s--%s' % (self.name, dateTime, threading.current_thread().ident)
         os.makedirs(working_dir,exist_ok=True)
+        self.truncated=None
+        self.__aborted=False
+        self.working_dir=os.path.abspath(working_dir)
+        self.state='running'
+        self.started=time.time()
+        self.finished=None
+        self.telemetry=None
         with open(os.path.join(os.path.split(_ve)[0], working_dir,'tmp.xml'),'w') as tmp:
             for t in bs:
                 tmp.write(t+'\n')
+        scratch=[]
+        for setup in self.run_setup:
+            scratch += setup(self.working_dir) or []
         if silent:
             if outstream:
                 outdev=open(outstream, 'w')
             else:
                 outdev=subprocess.DEVNULL
         else: outdev=None
+        sampler=None
+        failed=True
         try:
             p=subprocess.Popen([_ve, '--run', 'tmp.xml'],
                 cwd=working_dir,stdout=outdev,stderr=outdev, )
+            if _TelemetryInterval:
+                sampler=HostSampler(p.pid, _TelemetryInterval)
+                # Grows while the simulation runs
+                self.telemetry={'samples': sampler.samples}
+            self.__proc=p
+            if self.run_key:
+                _Journal.record('running', self.run_key, pid=p.pid, working_dir=self.working_dir)
+            for w in self.run_watchers:
+                w.start(self)
             try:
-                p.wait()
+                failed=p.wait() != 0
             except KeyboardInterrupt:
                 print("forwarding term signal to child.")
                 p.terminate()
         except subprocess.SubprocessError:
             print("ERROR while running subprocess")
-
+        finally:
+            for w in self.run_watchers:
+                w.stop()
+            self.__proc=None
+            if sampler:
+                sampler.stop()
+            if silent and outstream:
+                outdev.close()
+        return self.__collect(working_dir, scratch, sampler, failed)
+
+    def __collect(self, working_dir, scratch, sampler, failed):
+        # Whole-run stats, then one record per region of interest
         self.stats={}
-        for logf in [f for f in os.listdir(working_dir) if os.path.splitext(f)[1]==".log"]:
+        for logf in [f for f in os.listdir(working_dir) if os.path.splitext(f)[1]==".log" and not roi_log.match(f)]:
             # print "parsing %s " % logf
-            with open(os.path.join(working_dir,logf),'r') as log:
-                for line in log.readlines():
-                    t = re.match("\\[Stats\\]\\s+\\((\\S+)\\)\\s+(\\S+)\\s+(\\S+)\\s*(\\S*)",line)
-                    if t:
-                        if t.group(1) not in self.stats:
-                            self.stats[t.group(1)]={}
-                        self.stats[t.group(1).strip()][t.group(2).strip()]=(eval(t.group(3).strip()),t.group(4).strip())
-                        # print "%s.%s = %s %s" % (t.group(1), t.group(2), t.group(3), t.group(4))
+            parseStats(os.path.join(working_dir,logf), self.stats)
             #os.unlink(os.path.join(working_dir,logf))
-        #shutil.rmtree(working_dir)
+        # failed is None when unknown: a run that ended dumps whole-run stats
+        if failed is None:
+            failed=not self.stats
+        self.rois=parseRois(working_dir)
+        if sampler:
+            self.telemetry['mips']=mipsSeries(sampler.start, parseRois(working_dir, sampled=True), working_dir)
+            self.stats['host']=summary(sampler, self.stats)
+        if self.info:
+            self.stats['run'] = dict((k, (v, '')) for k, v in self.info.items())
+        if self.truncated:
+            self.stats.setdefault('run', {})['truncated'] = (1, '')
+            self.stats['run']['truncation_reason'] = (self.truncated, '')
+        self.finished=time.time()
+        # Stopped early through the guest, the stats are complete
+        if self.truncated:
+            failed=self.__aborted
+        self.state='failed' if failed else 'done'
+        if _RunRetention != 'none':
+            saveStats(os.path.join(working_dir, 'stats.json'), self.stats)
+        if self.run_key:
+            if _RunRetention == 'none':
+                _Journal.record('completed', self.run_key, state=self.state, stats=self.stats)
+            else:
+                _Journal.record('completed', self.run_key, state=self.state,
+                                working_dir=os.path.abspath(working_dir),
+                                result=os.path.abspath(os.path.join(working_dir, 'stats.json')))
+        if _RunRetention != 'all':
+            for f in scratch:
+                if os.path.exists(f):
+                    os.unlink(f)
+        if _RunRetention == 'none':
+            shutil.rmtree(working_dir)
         return self
 
+    def stop(self, reason, grace=60, failed=False):
+        '''
+        End the running simulation before the guest does, for reason
+        (recorded in the 'run' stats as truncation_reason), through the
+        guest with quit() so that the simulator still dumps its stats. Such
+        a run counts as done. Without a way to quit through the guest, the
+        simulation goes on.
+        With failed, the run is aborted instead and counts as failed: the
+        simulator is terminated when it cannot be quit or has not exited
+        after grace seconds.
+        Returns whether the simulator has exited.
+        '''
+        p=self.__proc
+        if p is None or p.poll() is not None:
+            return True
+        self.truncated=reason
+        self.__aborted=failed
+        try:
+            sent=self.quit()
+        except Exception as e:
+            print("Could not quit %s through the guest: %s" % (self.name, e))
+            sent=False
+        if sent:
+            try:
+                p.wait(grace)
+                return True
+            except subprocess.TimeoutExpired:
+                print("%s has not exited %ss after the quit request." % (self.name, grace))
+        if failed:
+            p.terminate()
+            return True
+        if not sent:
+            print("%s cannot be quit through the guest (no socket console), it goes on." % self.name)
+            self.truncated=None
+        return False
+
+    def quit(self):
+        ''' Ask the guest to end the simulation; False when the platform cannot. '''
+        return False
+
     def begin(self, fmt):
         if fmt == 'xml':
             return "<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n<vpsim source=\"python\">"
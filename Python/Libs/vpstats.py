@@ -0,0 +1,139 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os, re, ast, json
+
+def parseStats(path, stats=None):
+    '''
+    Parse the [Stats] lines of a VPSim log file into a
+    {component: {counter: (value, unit)}} dict.
+    '''
+    with open(path,'r') as log:
+        return parseStatsLines(log.readlines(), stats)
+
+def _value(text):
+    # Numbers (1, 2.5e3, 0x10, ...); anything else, e.g. printed by the
+    # guest, stays a string and is never evaluated
+    try:
+        v = ast.literal_eval(text)
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return text
+    return v if isinstance(v, (int, float)) and not isinstance(v, bool) else text
+
+def parseStatsLines(lines, stats=None):
+    ''' Same as parseStats, for lines of text (e.g. the output of a benchmark). '''
+    if stats is None:
+        stats={}
+    for line in lines:
+        t = re.match("\\[Stats\\]\\s+\\((\\S+)\\)\\s+(\\S+)\\s+(\\S+)\\s*(\\S*)",line)
+        if t:
+            if t.group(1) not in stats:
+                stats[t.group(1)]={}
+            stats[t.group(1).strip()][t.group(2).strip()]=(_value(t.group(3).strip()),t.group(4).strip())
+    return stats
+
+def saveStats(path, stats):
+    ''' Write a stats dict as JSON, e.g. the stats.json of a run directory. '''
+    with open(path, 'w') as f:
+        json.dump(stats, f, default=str)
+
+def statsFromJson(obj):
+    ''' Stats dict from its JSON form ((value, unit) pairs come back as lists). '''
+    return dict((comp, dict((counter, tuple(v)) for counter, v in counters.items()))
+                for comp, counters in obj.items())
+
+def loadStats(path):
+    ''' Read a stats dict written by saveStats. '''
+    with open(path) as f:
+        return statsFromJson(json.load(f))
+
+# Stats of a region of interest, dumped by the Monitor at each 'sesam benchmark'
+roi_log = re.compile(r'^sesamBench_(.*)_(\d+)\.log$')
+
+# Regions of sampled runs (sampling.py): SMARTS windows and warm-ups, and
+# 'sesam sample' intervals
+sampled_region = re.compile(r'@(w|warmup|sample)$')
+
+# Sections describing the run (System.info, telemetry.py) rather than the
+# simulated platform
+run_sections = ['host', 'run']
+
+# Sections printed by the guest tool ('sesam benchmark --cpus/--placement'
+# and '--pmu'): they describe or count the benchmark, not the components
+guest_sections = ['placement', 'guest_pmu']
+
+def totals(stats):
+    ''' Sum each counter over all components (the run_sections and guest_sections excepted). '''
+    tot = {}
+    for comp in stats:
+        if comp in run_sections or comp in guest_sections:
+            continue
+        for counter, (v, _) in stats[comp].items():
+            if isinstance(v, (int, float)):
+                tot[counter] = tot.get(counter, 0) + v
+    return tot
+
+def parseRois(working_dir, sampled=False):
+    '''
+    One record per region of interest of a run directory, in dump order
+    (the modification time of their logs):
+    {'app', 'seq', 'file', 'stats', 'totals'} plus the captured 'output'
+    of the benchmark when there is one (sesamBench_<app>_<n>.out). The
+    regions of sampled runs are left out unless sampled is set.
+    The simulator keeps no global dump counter: logs written within the
+    timestamp granularity of the file system (up to 1 s, e.g. on NFS) are
+    only ordered by seq, which counts the regions of each application, so
+    their order across applications is not guaranteed.
+    '''
+    rois = []
+    for f in os.listdir(working_dir):
+        t = roi_log.match(f)
+        if t and (sampled or not sampled_region.search(t.group(1))):
+            stats = parseStats(os.path.join(working_dir, f))
+            roi = {
+                'app': t.group(1),
+                'seq': int(t.group(2)),
+                'file': f,
+                'mtime': os.path.getmtime(os.path.join(working_dir, f)),
+                'stats': stats,
+                'totals': totals(stats),
+            }
+            out = os.path.join(working_dir, os.path.splitext(f)[0] + '.out')
+            if os.path.exists(out):
+                with open(out) as o:
+                    attachOutput(roi, o.read())
+            rois.append(roi)
+    return sorted(rois, key=lambda r: (r['mtime'], r['seq']))
+
+def roiCpus(roi):
+    ''' CPUs a ROI was pinned to ('sesam benchmark --cpus/--placement'), or None. '''
+    mask = roi['stats'].get('placement', {}).get('cpu_mask')
+    if mask is None:
+        return None
+    return [i for i in range(mask[0].bit_length()) if mask[0] >> i & 1]
+
+def attachOutput(roi, output):
+    '''
+    Attach the output of a benchmark to its ROI record and merge the [Stats]
+    lines it printed (e.g. 'sesam benchmark --pmu' guest PMU counters) into
+    the record's stats. The Monitor cannot log them: they only reach the
+    records through the output captured by guest.automate() (the .out files).
+    '''
+    roi['output'] = output
+    for comp, counters in parseStatsLines(output.splitlines()).items():
+        if comp not in roi['stats']:
+            roi['stats'][comp] = counters
+    roi['totals'] = totals(roi['stats'])
@@ -0,0 +1,159 @@
+"""
+Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os, stat, hashlib, subprocess
+
+# Packaging of host directories (benchmark binaries and inputs) into small
+# artifacts handed to the guest without simulated network transfers:
+# - 'cpio' (newc): appended to an initramfs, or attached as a raw block
+#   device and extracted in the guest with 'cpio -idm < /dev/vdX',
+# - 'ext2': attached as a block device and mounted in the guest.
+# Artifacts are named after a hash of the directory contents and cached, so
+# a sweep packs each workload once whatever the number of runs.
+formats = ['cpio', 'ext2']
+
+def default_cache_dir():
+    return os.path.join(os.getenv('VPSIM_HOME', '.'), 'bin', 'workloads')
+
+def _walk(directory):
+    # (relative path, absolute path) of every entry, parents first
+    entries = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for n in dirs + sorted(files):
+            p = os.path.join(root, n)
+            entries.append((os.path.relpath(p, directory), p))
+    return entries
+
+def digest(directory, fmt, prefix=''):
+    ''' SHA-256 of the names, modes, link targets and contents of a directory tree. '''
+    h = hashlib.sha256(('%s\0%s\0' % (fmt, prefix)).encode())
+    for rel, p in _walk(directory):
+        st = os.lstat(p)
+        h.update(('%s\0%o\0' % (rel, st.st_mode)).encode())
+        if stat.S_ISLNK(st.st_mode):
+            h.update(os.readlink(p).encode())
+        elif stat.S_ISREG(st.st_mode):
+            with open(p, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    h.update(chunk)
+        h.update(b'\0')
+    return h.hexdigest()
+
+def _cpio_entry(out, ino, name, mode, data=b'', nlink=1):
+    name = name.encode() + b'\0'
+    out.write((('070701' + '%08X' * 13) % (
+        ino, mode, 0, 0, nlink, 0, len(data), 0, 0, 0, 0, len(name), 0)).encode())
+    out.write(name + b'\0' * (-(110 + len(name)) % 4))
+    out.write(data + b'\0' * (-len(data) % 4))
+
+def write_cpio(directory, out, prefix=''):
+    '''
+    Write a directory tree as a newc cpio archive to a binary stream. Entries
+    belong to root and have a zero mtime, so the archive only depends on the
+    contents. prefix (e.g. 'opt/bench') places the tree below that path.
+    '''
+    ino = 1
+    parts = [p for p in prefix.strip('/').split('/') if p]
+    for i in range(len(parts)):
+        _cpio_entry(out, ino, '/'.join(parts[:i+1]), stat.S_IFDIR | 0o755, nlink=2)
+        ino += 1
+    for rel, p in _walk(directory):
+        st = os.lstat(p)
+        name = '/'.join(parts + rel.split(os.sep))
+        if stat.S_ISLNK(st.st_mode):
+            data = os.readlink(p).encode()
+        elif stat.S_ISREG(st.st_mode):
+            with open(p, 'rb') as f:
+                data = f.read()
+        elif stat.S_ISDIR(st.st_mode):
+            data = b''
+        else:
+            continue
+        _cpio_entry(out, ino, name, st.st_mode, data, 2 if stat.S_ISDIR(st.st_mode) else 1)
+        ino += 1
+    _cpio_entry(out, 0, 'TRAILER!!!', 0)
+    # Block devices only expose whole sectors
+    pad = -out.tell() % 512
+    out.write(b'\0' * pad)
+
+def write_ext2(directory, path, prefix=''):
+    ''' Create an ext2 image holding a directory tree (needs mke2fs >= 1.43). '''
+    if prefix.strip('/'):
+        raise Exception("ext2 workloads are mounted by the guest, prefix is not supported.")
+    kb = 0
+    for rel, p in _walk(directory):
+        kb += (os.lstat(p).st_size + 1023) // 1024 + 1
+    # Room for metadata; mke2fs creates the file with this size
+    kb = int(kb * 1.3) + 2048
+    cmd = ['mke2fs', '-q', '-F', '-t', 'ext2', '-b', '1024', '-m', '0',
+           '-E', 'root_owner=0:0', '-d', directory, path, '%dk' % kb]
+    try:
+        subprocess.check_call(cmd, stdout=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise Exception("Could not create ext2 workload image (%s): %s" % (' '.join(cmd), e))
+
+def pack(directory, fmt='ext2', prefix='', cache_dir=None):
+    '''
+    Package a directory into a cached artifact and return its path.
+    The artifact is rebuilt only when the contents of the directory change.
+    '''
+    if fmt not in formats:
+        raise Exception("Workload format should be one of: %s" % ', '.join(formats))
+    directory = os.path.abspath(directory)
+    if not os.path.isdir(directory):
+        raise Exception("Workload directory not found: %s" % directory)
+    cache_dir = cache_dir or default_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, '%s-%s.%s' % (
+        os.path.basename(directory), digest(directory, fmt, prefix)[:16], fmt))
+    if os.path.exists(path):
+        return path
+    # Built aside and renamed: concurrent sweeps never see a partial artifact
+    tmp = '%s.%s.tmp' % (path, os.getpid())
+    try:
+        if fmt == 'cpio':
+            with open(tmp, 'wb') as f:
+                write_cpio(directory, f, prefix)
+        else:
+            write_ext2(directory, tmp, prefix)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return path
+
+def initrd(directory, base=None, prefix='', cache_dir=None):
+    '''
+    Initramfs holding a directory tree, appended to the base initramfs if
+    any (the kernel unpacks concatenated cpio archives in order).
+    '''
+    archive = pack(directory, 'cpio', prefix, cache_dir)
+    if not base:
+        return archive
+    with open(base, 'rb') as f:
+        h = hashlib.sha256(f.read()).hexdigest()[:16]
+    path = '%s+%s' % (os.path.splitext(archive)[0], h) + '.cpio'
+    if not os.path.exists(path):
+        tmp = '%s.%s.tmp' % (path, os.getpid())
+        with open(tmp, 'wb') as out:
+            for p in [base, archive]:
+                with open(p, 'rb') as f:
+                    out.write(f.read())
+                # the kernel expects each archive on a 4-byte boundary
+                out.write(b'\0' * (-out.tell() % 4))
+        os.replace(tmp, path)
+    return path
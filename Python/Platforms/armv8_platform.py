@@ -18,9 +18,12 @@ from vpsim import System, Memory, Interconnect, ns, Param, BlobLoader, ElfLoader
 from vpsim import ModelProvider, ModelProviderCpu, ModelProviderDev, ModelProviderParam1, ModelProviderParam2
 from vpsim import PL011Uart, XuartPs, Monitor, PythonDevice, Cache, NoCMemoryController, CacheController, CacheIdController, CoherentInterconnect
 from vpsim import SystemCCosim, IOAccessCosim, NoCDeviceController
-import getpass, os, math
+import getpass, os, math, time
 
 import dt
+import addrmap
+import qcow2
+import workload
 
 VPSIM_HOME = os.getenv('VPSIM_HOME')
 
@@ -29,6 +32,154 @@ model_provider = {
     'path': os.path.join(VPSIM_HOME,'lib','qemu','vpsim-qemu.so'),
 }
 
+# QEMU options of each execution mode (conf['cpu']['execution_mode']):
+# - single: deterministic single-threaded TCG with icount (default),
+# - icount: single-threaded TCG, icount with conf['cpu']['icount_shift'],
+# - icount-auto: single-threaded TCG, icount shift adapted to the host speed,
+# - mttcg: one host thread per guest core, no icount.
+# Only the deterministic modes can drive the cache/NoC co-simulation.
+execution_modes = {
+    'single': lambda cpu: ('tcg,thread=single', '0'),
+    'icount': lambda cpu: ('tcg,thread=single', 'shift=%s' % cpu.get('icount_shift', 0)),
+    'icount-auto': lambda cpu: ('tcg,thread=single', 'shift=auto'),
+    'mttcg': lambda cpu: ('tcg,thread=multi', None),
+}
+cosim_execution_modes = ['single', 'icount']
+
+# One GICv3 redistributor (RD_base + SGI_base frames) per core
+GICV3_REDIST_STRIDE = 0x20000
+
+def _hops(a, b):
+    # XY routing: hop count is the Manhattan distance between tiles
+    return abs(a[0]-b[0]) + abs(a[1]-b[1])
+
+# Placement strategies order the free tiles of the mesh; clusters and home
+# nodes are then assigned to the first tiles of that order. A strategy is
+# any callable (tiles, memory_controller_positions) -> ordered tiles.
+placement_strategies = {
+    'row-major': lambda tiles, mcs: sorted(tiles, key=lambda t: (t[1], t[0])),
+    'column-major': lambda tiles, mcs: sorted(tiles),
+    'checkerboard': lambda tiles, mcs: sorted(tiles, key=lambda t: ((t[0]+t[1])%2, t[1], t[0])),
+    'min-hops': lambda tiles, mcs: sorted(tiles,
+        key=lambda t: (sum(_hops(t, m) for m in mcs)/float(len(mcs)) if mcs else 0, t[1], t[0])),
+}
+
+def address_slices(base, size, n, interleave_step=0):
+    '''
+    Split [base, base+size) into n contiguous slices whose sizes differ by
+    at most one interleave step; every slice but the last is aligned on it.
+    '''
+    unit = interleave_step if interleave_step else 1
+    units, rest = divmod(size, unit)
+    slices = []
+    for i in range(n):
+        sz = (units//n + (1 if i < units%n else 0)) * unit
+        if i == n-1:
+            sz += rest
+        slices.append((base, sz))
+        base += sz
+    return slices
+
+def mesh_placement(x_nodes, y_nodes, cores, cores_per_cluster, home_nodes,
+        memory_controllers, ram_base, ram_size, interleave_step=0,
+        strategy='row-major', reserved=[]):
+    '''
+    Place CPU clusters and L3 home nodes on a x_nodes * y_nodes mesh and
+    slice the RAM between home nodes and memory controllers.
+    Returns a dict with the 'cpu_clusters', 'home-nodes' and
+    'memory-controllers' entries, in the format expected by FullSystem.
+    '''
+    if cores % cores_per_cluster:
+        raise Exception("Number of cores must be a multiple of cores_per_cluster.")
+    if not callable(strategy):
+        strategy = placement_strategies[strategy]
+    tiles = [(x, y) for x in range(x_nodes) for y in range(y_nodes) if (x, y) not in reserved]
+    tiles = strategy(tiles, list(memory_controllers))
+    n_clusters = cores // cores_per_cluster
+    if n_clusters > len(tiles) or home_nodes > len(tiles):
+        raise Exception("Mesh %sx%s has only %s free tiles." % (x_nodes, y_nodes, len(tiles)))
+
+    clusters = [(list(range(i*cores_per_cluster, (i+1)*cores_per_cluster)), tiles[i])
+                for i in range(n_clusters)]
+    hns = [(b, sz, tiles[i]) for i, (b, sz) in
+           enumerate(address_slices(ram_base, ram_size, home_nodes, interleave_step))]
+    mcs = [(b, sz, pos) for (b, sz), pos in
+           zip(address_slices(ram_base, ram_size, len(memory_controllers), interleave_step), memory_controllers)]
+    return {'cpu_clusters': clusters, 'home-nodes': hns, 'memory-controllers': mcs}
+
+def _spread_order(positions):
+    # Farthest-point order: each next position is the farthest from those taken
+    order, rest = [0], list(range(1, len(positions)))
+    while rest:
+        i = max(rest, key=lambda i: (min(_hops(positions[i], positions[j]) for j in order), -i))
+        order.append(i)
+        rest.remove(i)
+    return order
+
+def thread_placement(conf, policy, n=None):
+    '''
+    Guest CPUs for n benchmark threads (all the CPUs by default), chosen from the mesh positions of
+    the cpu_clusters of a FullSystem conf:
+    - 'compact': cores of the clusters closest to the first one,
+    - 'spread': one core per cluster in turn, clusters as far apart as possible,
+    - 'nearest': cores of the clusters closest to a memory controller,
+    - a list of CPU ids is used as is.
+    Pass the result to 'sesam benchmark' with placement_option().
+    '''
+    clusters = conf['cpu']['cpu_clusters']
+    if not isinstance(policy, str):
+        cpus = list(policy)
+    elif policy == 'compact':
+        order = sorted(range(len(clusters)), key=lambda c: (_hops(clusters[c][1], clusters[0][1]), c))
+        cpus = [cpu for c in order for cpu in clusters[c][0]]
+    elif policy == 'nearest':
+        mcs = [pos for _, _, pos in conf['memory_subsystem']['off-chip-memory']['memory-controllers']]
+        order = sorted(range(len(clusters)), key=lambda c: (min(_hops(clusters[c][1], m) for m in mcs), c))
+        cpus = [cpu for c in order for cpu in clusters[c][0]]
+    elif policy == 'spread':
+        order = _spread_order([pos for _, pos in clusters])
+        cpus = [clusters[c][0][k] for k in range(max(len(cl[0]) for cl in clusters))
+                for c in order if k < len(clusters[c][0])]
+    else:
+        raise Exception("Thread placement should be one of: compact, spread, nearest, or a list of CPUs")
+    if n is None:
+        n = len(cpus)
+    if n > len(cpus):
+        raise Exception("Cannot place %s threads on %s CPUs." % (n, len(cpus)))
+    return cpus[:n]
+
+def placement_option(cpus):
+    ''' 'sesam benchmark' option pinning the benchmark to these CPUs. '''
+    return '--cpus=%s' % ','.join(str(c) for c in cpus)
+
+def cpu_positions(conf, cpus):
+    ''' Mesh position of each CPU, e.g. of the CPUs recorded in a ROI (vpstats.roiCpus). '''
+    pos = dict((cpu, p) for ids, p in conf['cpu']['cpu_clusters'] for cpu in ids)
+    return dict((cpu, pos[cpu]) for cpu in cpus)
+
+def component_roles(system):
+    '''
+    Role of each component of a platform in its stats: 'cpu', 'l1', 'l2',
+    'l3' (data caches by level), 'noc' (the mesh), 'cluster_interconnect',
+    'bus', 'memory' and 'memory_controller'.
+    '''
+    roles = {}
+    for ip in system.components():
+        kind = ip.__class__.__name__
+        if kind == 'ModelProviderCpu':
+            roles[ip.name] = 'cpu'
+        elif kind == 'Cache':
+            roles[ip.name] = 'l%d' % ip.level
+        elif kind == 'CoherentInterconnect':
+            roles[ip.name] = 'noc' if ip.is_mesh else 'cluster_interconnect'
+        elif kind == 'Interconnect':
+            roles[ip.name] = 'bus'
+        elif kind == 'Memory':
+            roles[ip.name] = 'memory'
+        elif kind == 'NoCMemoryController':
+            roles[ip.name] = 'memory_controller'
+    return roles
+
 class Armv8Cluster:
     '''
     Generate a self-contained ARM-v8 cluster with N cores, and a GIC.
@@ -39,20 +190,36 @@ class Armv8Cluster:
         self.q.path = model_provider['path']
         self.q.io_poll_period=1000
 
+        # The quantum of the model provider is the one QEMU runs with; the
+        # cpus get the same value
+        quantum = None
         if 'quantum' in conf['cpu']:
-            self.q.quantum = conf['cpu']['quantum']
+            if conf['cpu']['quantum'] == 'auto':
+                # Use the quantum calibrated for this platform size (see quantum_tuning)
+                import quantum_tuning
+                quantum = quantum_tuning.lookup(conf['cpu']['cores'])
+                if quantum is None:
+                    print("Warning: 'quantum': 'auto' but no calibration in %s, using the default quantum."
+                          % quantum_tuning.default_path())
+            else:
+                quantum = conf['cpu']['quantum']
+        if quantum is not None:
+            self.q.quantum = quantum
 
         if 'conversion_factor' in conf['cpu']:
             self.q.conversion_factor = conf['cpu']['conversion_factor']
 
         # Initialize QEMU
-        ModelProviderParam2(provider=self.q.name, option='--accel', value='tcg,thread=single')
-        ModelProviderParam2(provider=self.q.name, option='-icount', value='0')
+        accel, icount = execution_modes[conf['cpu'].get('execution_mode', 'single')](conf['cpu'])
+        ModelProviderParam2(provider=self.q.name, option='--accel', value=accel)
+        if icount is not None:
+            ModelProviderParam2(provider=self.q.name, option='-icount', value=icount)
         ModelProviderParam1(provider=self.q.name, option='-nographic')
         ModelProviderParam2(provider=self.q.name, option='-machine', value='qslave')
         ModelProviderParam2(provider=self.q.name, option='-monitor', value='none')
 
         self.dt = dt.DevTree(conf['platform_name'],conf['device_tree_template'])
+        self.addrmap = addrmap.AddressMap()
 
         if conf['log_execution']:
             ModelProviderParam2(provider=self.q.name, option='-d', value='mmu,in_asm,int,guest_errors')
@@ -78,7 +245,7 @@ class Armv8Cluster:
             cpu.reset_pc = conf['software']['entry'] if conf['software']['mode']=='custom' else 0
             cpu.secure = False
             cpu.start_powered_off = (i > 0)
-            cpu.quantum = 1000 # actually fixed to 0xffff in QEMU
+            cpu.quantum = quantum if quantum is not None else 1000
             cpu.provider=self.q.name
             self.cores.append(cpu)
             self.sysbus.n_in_ports += 1
@@ -93,6 +260,9 @@ class Armv8Cluster:
 
         # Initialize the GIC regions within QEMU
         if conf['cpu']['gic']['version'] == 3:
+            if conf['cpu']['gic']['redistributor_size'] < n_cores * GICV3_REDIST_STRIDE:
+                raise Exception("GICv3 redistributor region too small for %s cores (need %s bytes)."
+                    % (n_cores, hex(n_cores * GICV3_REDIST_STRIDE)))
             gicv3_dist = ModelProviderDev( \
                 provider=self.q.name,
                 model='gicv3_dist',
@@ -107,6 +277,8 @@ class Armv8Cluster:
                 size=conf['cpu']['gic']['redistributor_size'],
                 irq=n_cores)
 
+            self.addrmap.add(gicv3_dist.model, gicv3_dist.base_address, gicv3_dist.size)
+            self.addrmap.add(gicv3_redist.model, gicv3_redist.base_address, gicv3_redist.size)
             dt_conf['gic']='v3'
         elif conf['cpu']['gic']['version'] == 2:
             gicv2_dist = ModelProviderDev( \
@@ -137,6 +309,8 @@ class Armv8Cluster:
                 size=conf['cpu']['gic']['vcpu_size'],
                 irq=0)
 
+            for gic in [gicv2_dist, gicv2_cpu, gicv2_hyp, gicv2_vcpu]:
+                self.addrmap.add(gic.model, gic.base_address, gic.size)
             dt_conf['gic']='v2'
         else:
             Exception("Unknown GIC version (must be 2 or 3).")
@@ -259,10 +433,23 @@ class FullSystem(System):
     ''' Generate the full system '''
     def __init__(self, conf):
         System.__init__(self, conf['platform_name'])
+        self.conf = conf
+        mode = conf['cpu'].get('execution_mode', 'single')
+        if mode not in execution_modes:
+            raise Exception("Execution mode should be one of: %s" % ", ".join(execution_modes))
+        if conf['memory_subsystem']['simulate'] and mode not in cosim_execution_modes:
+            raise Exception("Execution mode '%s' cannot be used with the memory-subsystem simulation "
+                "(use %s, or set memory_subsystem.simulate to False)." % (mode, " or ".join(cosim_execution_modes)))
+        self.info['execution_mode'] = mode
         self.cluster = Armv8Cluster(conf)
         sysbus = self.cluster.sysbus
         provider = self.cluster.q
         self.dt = self.cluster.dt
+        self.addrmap = self.cluster.addrmap
+        # UART name -> console socket, relative to the run directory
+        self.consoles = {}
+        # Console clients opened by console(), see quit()
+        self.__clients = []
 
         # Create main memory
         ram_size=0
@@ -279,6 +466,7 @@ class FullSystem(System):
                     c.reset_pc=self.ram.base_address
             ram_size += ram['size']
             ram_spaces.append(self.ram)
+            self.addrmap.add(self.ram.name, ram['base'], ram['size'])
             self.ram.channels=1
             self.ram.channel_width=8
             dt.c_memory(ram,self.dt.getref())
@@ -426,6 +614,11 @@ class FullSystem(System):
             provider.notify_ioaccess=False
         sysbus.n_out_ports += 1
         sysbus >> Monitor(size=4, base_address=conf['sesam_monitor_addr'])
+        self.addrmap.add('sesam_monitor', conf['sesam_monitor_addr'], 4)
+        # Lets the guest tools find the Monitor
+        dt.c_sesam_monitor({
+            'base': conf['sesam_monitor_addr'],
+            'size': 4}, self.dt.getref())
 
         ModelProviderParam2(provider=provider.name,
             option='-m',
@@ -445,16 +638,32 @@ class FullSystem(System):
                     interrupt_parent=provider.name,
                     irq_n=uart['irq'],
                     base_address=uart['base'])
+                self.addrmap.add(uart['name'], uart['base'], uart['size'])
                 dt.c_cadence_uart(uart, self.dt.getref())
             elif typ == 'pl011':
                 '''ModelProviderParam2(provider=provider.name,
                     option='-chardev',
                     value='socket,server,host=localhost,port=%s,mux=on,id=char0'%(
                         uart['port']))'''
-                ModelProviderParam2(provider=provider.name,
-                    option='-serial',
-                    value='mon:stdio')
+                console = uart.get('console', 'stdio')
+                if console == 'stdio':
+                    ModelProviderParam2(provider=provider.name,
+                        option='-serial',
+                        value='mon:stdio')
+                elif console == 'socket':
+                    # One Unix socket per run, in the run directory, so that
+                    # parallel runs do not share the terminal
+                    self.consoles[uart['name']] = '%s.sock' % uart['name']
+                    ModelProviderParam2(provider=provider.name,
+                        option='-chardev',
+                        value='socket,id=%s,path=%s,server=on,wait=off' % (uart['name'], self.consoles[uart['name']]))
+                    ModelProviderParam2(provider=provider.name,
+                        option='-serial',
+                        value='chardev:%s' % uart['name'])
+                else:
+                    raise Exception("UART console should be one of: stdio, socket")
                 dt.c_pl11_uart(uart, self.dt.getref())
+                self.addrmap.add(uart['name'], uart['base'], 0x1000)
                 uart=ModelProviderDev(uart['name'],provider=provider.name,
                     model='pl011',
                     base_address=uart['base'],
@@ -469,6 +678,7 @@ class FullSystem(System):
 
         # PCI-E host bridge inside QEMU
         pcie = ModelProviderDev(model='pcie', provider=provider.name, base_address=0x10000000, irq=3, size=0)
+        self.addrmap.add('pcie', pcie.base_address, pcie.size)
 
         # Now create block and network devices using VirtIO
         ## First map the container buses, then create the devices
@@ -480,6 +690,7 @@ class FullSystem(System):
                 base_address=net['base'],
                 size=net['size'],
                 irq=net['irq'])
+            self.addrmap.add(net['name'], net['base'], net['size'])
 
             dt.c_virtio(net, self.dt.getref())
 
@@ -550,12 +761,28 @@ class FullSystem(System):
                     base_address=b['base'],
                     size=b['size'],
                     irq=b['irq'])
+                self.addrmap.add(b['name'], b['base'], b['size'])
+                if 'workload' in b:
+                    # Host directory packaged into a cached ext2 or cpio image
+                    image = workload.pack(b['workload'], b.get('format', 'ext2'), b.get('prefix', ''))
+                else:
+                    image = b['image']
                 ModelProviderParam2(provider=provider.name,
                     option='-device',
                     value='virtio-blk-device,drive=%s' % block.name)
-                ModelProviderParam2(provider=provider.name,
-                    option='-drive',
-                    value='file=%s,id=%s' % (b['image'],block.name))
+                if b.get('overlay', True):
+                    # Each run writes to its own copy-on-write overlay, created in
+                    # the run directory, so that parallel runs share the image
+                    overlay = '%s.overlay.qcow2' % block.name
+                    self.run_setup.append(lambda wd, image=image, overlay=overlay:
+                        [qcow2.create_overlay(os.path.join(wd, overlay), os.path.realpath(image))])
+                    ModelProviderParam2(provider=provider.name,
+                        option='-drive',
+                        value='file=%s,format=qcow2,id=%s' % (overlay,block.name))
+                else:
+                    ModelProviderParam2(provider=provider.name,
+                        option='-drive',
+                        value='file=%s,id=%s' % (image,block.name))
 
 
         if 'cdrom' in conf:
@@ -572,6 +799,7 @@ class FullSystem(System):
                     irq=cd['irq'])
 
                 cd['size']=0x1000
+                self.addrmap.add(c.name, cd['base'], cd['size'])
                 dt.c_virtio(cd, self.dt.getref())
 
                 ModelProviderParam2(provider=provider.name,
@@ -584,10 +812,12 @@ class FullSystem(System):
         if 'unused_spaces' in conf:
             for unused in conf['unused_spaces']:
                 sysbus.n_out_ports += 1
-                sysbus >> Memory(
+                mem = Memory(
                     base_address = unused['base'],
                     size = unused['size'],
                     dmi_enable = False)
+                sysbus >> mem
+                self.addrmap.add(mem.name, unused['base'], unused['size'])
 
         # SystemC target subsystems
         if 'systemc' in conf:
@@ -598,6 +828,7 @@ class FullSystem(System):
                 base_address=systemc['base'],
                 size=systemc['size'],
                 interrupt_parent=provider.name)
+            self.addrmap.add(systemc['name'], systemc['base'], systemc['size'])
             dt.c_systemc_output_port(systemc, self.dt.getref())
 
         # Remote target subsystems
@@ -612,6 +843,7 @@ class FullSystem(System):
                     irq_n=remote['irq'],
                     channel=remote['name'],
                     irq_channel=remote['name']+'_irq')
+                self.addrmap.add(remote['name'], remote['base'], remote['size'])
 
         # User-defined Python devices
         if 'pydevs' in conf:
@@ -624,6 +856,7 @@ class FullSystem(System):
                 interrupt_parent=provider.name,
                 py_module_name=pydev['module'],
                 param_string=pydev['config'],)
+            self.addrmap.add(pydev['name'], pydev['base'], pydev['size'])
 
         if 'fw_cfg_addr' in conf:
             ModelProviderDev(provider=provider.name,
@@ -631,6 +864,7 @@ class FullSystem(System):
                     base_address=conf['fw_cfg_addr'],
                     size=0x18,
                     irq=0)
+            self.addrmap.add('fw_cfg', conf['fw_cfg_addr'], 0x18)
             dt.c_fw_cfg({'base':conf['fw_cfg_addr']},self.dt.getref())
 
         if 'rtc' in conf:
@@ -640,6 +874,7 @@ class FullSystem(System):
                 size=0x1000,
                 irq=conf['rtc']['irq'])
             conf['rtc']['size']=0x1000
+            self.addrmap.add('rtc', conf['rtc']['base'], conf['rtc']['size'])
             dt.c_pl031(conf['rtc'], self.dt.getref())
 
         if 'flash' in conf:
@@ -649,6 +884,7 @@ class FullSystem(System):
                     base_address=fl['base'],
                     size=0,
                     irq=fl['size'])
+                self.addrmap.add('flash_%s'%i, fl['base'], fl['size'])
                 if 'img' in fl:
                     ModelProviderParam2(provider=provider.name,
                         option='-drive',
@@ -701,7 +937,12 @@ class FullSystem(System):
         if 'dtb' in conf['software'] and conf['software']['dtb'] is not None:
             ModelProviderParam2(provider=provider.name, option='-dtb', value=conf['software']['dtb']['path'])
         if 'rootfs' in conf['software']:
-            ModelProviderParam2(provider=provider.name, option='-initrd', value=conf['software']['rootfs']['path'])
+            rootfs = conf['software']['rootfs']
+            if 'workload' in rootfs:
+                initrd = workload.initrd(rootfs['workload'], rootfs.get('base'), rootfs.get('prefix', ''))
+            else:
+                initrd = rootfs['path']
+            ModelProviderParam2(provider=provider.name, option='-initrd', value=initrd)
         ModelProviderParam2(provider=provider.name, option='-kernel', value=conf['software']['kernel']['path'])
         if 'bootargs' in conf['software']['kernel']:
             ModelProviderParam2(provider=provider.name, option='-append', value=conf['software']['kernel']['bootargs'])
@@ -709,11 +950,72 @@ class FullSystem(System):
         # Enable per-component logging
         self.addParam(Param("log", "enable"))
 
+        # Every memory-mapped IP is registered by now: reject colliding regions
+        # before they turn into a guest hang.
+        self.addrmap.check()
+
         # Generate device tree
         self.dt.make()
 
         # Export sysbus for extensions
         self.sysbus = sysbus
 
+        # Component name -> role, for the derived metrics of metrics.py
+        self.roles = component_roles(self)
+
     def getSystemBus(self):
         return self.sysbus
+
+    def metrics(self):
+        '''
+        Derived metrics of the last run (MPKI, hit rates, IPC, NoC latency,
+        memory bandwidth, ...), see metrics.py (requires NumPy).
+        '''
+        import metrics
+        m = metrics.derive([self.stats], self.roles, self.conf['cpu'].get('conversion_factor', 1.))
+        return dict((k, float(v[0])) for k, v in m.items() if k in metrics.run_metrics)
+
+    def predict(self, calibration=None):
+        '''
+        Screening alternative to build(simulate=True): estimate the average
+        memory access latency and bandwidth bounds of this platform with the
+        analytic model of mem_model (requires NumPy).
+        '''
+        import mem_model
+        return dict((k, float(v[0])) for k, v in mem_model.predict([self.conf], calibration).items())
+
+    def console(self, name=None, timeout=60, **kw):
+        '''
+        Connect to the socket console of a UART (the first one by default)
+        of the run started by build(simulate=True, wait=False).
+        Extra arguments go to console.Console (history, transcript).
+        '''
+        import console
+        if name is None and self.consoles:
+            name = sorted(self.consoles)[0]
+        if name not in self.consoles:
+            raise Exception("No socket console for UART %s (set 'console': 'socket')." % name)
+        deadline = time.time() + timeout
+        while getattr(self, 'working_dir', None) is None:
+            if time.time() > deadline:
+                raise Exception("The simulation of %s did not start." % self.name)
+            time.sleep(0.1)
+        con = console.Console(os.path.join(self.working_dir, self.consoles[name]),
+                              timeout=max(deadline - time.time(), 0), **kw)
+        self.__clients.append(con)
+        return con
+
+    def quit(self):
+        '''
+        End the simulation from the guest: interrupt the foreground command
+        on the socket console and run 'sesam quit', which requires a logged
+        in shell. Uses the console already opened by console() if any.
+        '''
+        if not self.consoles:
+            return False
+        # QEMU serves one client at a time
+        open_clients = [c for c in self.__clients if not c.closed]
+        con = open_clients[-1] if open_clients else self.console(timeout=5)
+        con.write('\x03')
+        con.sendline('sesam quit')
+        return True
@@ -24,6 +24,15 @@
 #include <iostream>
 #include <libgen.h>  // for basename()
 #include <limits.h> // for PATH_MAX
+#include <time.h>
+#include <sys/wait.h>
+#include <errno.h>
+#include <sched.h>
+#include <sys/syscall.h>
+#include <linux/perf_event.h>
+#include <fstream>
+#include <sstream>
+#include <vector>
 
 #include "sesamController.hpp"
 
@@ -37,6 +46,13 @@ void usage(){
   printf("    help\t\tShow this message\n");
   printf("    show\t\tShow component status\n");
   printf("    benchmark\t\tShow performance statistics of the executed program\n");
+  printf("\t\t\tsesam benchmark [--pmu[=event,...]] [--cpus=<list>|--placement=compact|spread:<n>] <application>\n");
+  printf("    batch\t\tRun the benchmarks listed in a file, one region per run\n");
+  printf("\t\t\tsesam batch <file>, lines: <name> <repetitions> <warm-ups> [options] <application>\n");
+  printf("    smarts\t\tSample the executed program with periodic detailed windows\n");
+  printf("\t\t\tsesam smarts <period-ms> <window-ms> <warmup-ms> <application>\n");
+  printf("    sample\t\tDump the statistics of the executed program periodically\n");
+  printf("\t\t\tsesam sample <N>ms|<N>insn <application>\n");
   printf("    quit\t\tQuit VPSim\n");
 }
 
@@ -47,6 +63,413 @@ bool is_system_command(const char *cmd) {
     // Check if the command is a system command in the PATH
     return system((string("command -v ") + cmd + " >/dev/null 2>&1").c_str()) == 0;
 }
+
+/* Resolve the application to run: its absolute path if it is a local
+ * executable, its name if it is a command in PATH. base_name is the name
+ * under which the host dumps the statistics. */
+void resolve_application(const char *app, string &path, string &base_name) {
+    string tmp = app;
+    bool is_local_executable = false;
+
+    // Check if the provided executable name contains a path
+    if (tmp.find('/') == string::npos) { // no path provided
+      // Check if it's a system command
+      if (!is_system_command(tmp.c_str())) {
+        // Not a system command, prepend "./" to check the current directory
+        string current_dir_app = "./" + tmp;
+        if (file_exists(current_dir_app.c_str())) {
+            tmp = current_dir_app;  // Use current directory version
+            is_local_executable = true;
+        } else {
+            printf("Application %s not found in current directory or system PATH\n", tmp.c_str());
+            exit(1);
+        }
+      } // Continue if the app is a system command
+    } else { //A path is provided with the app
+        is_local_executable = true;
+    }
+    if (is_local_executable) {
+        // Resolve the absolute path for local executables
+        char resolved_path[PATH_MAX];
+        if (realpath(tmp.c_str(), resolved_path) == NULL) {
+            perror("realpath");
+            exit(1);
+        }
+        // Extract the base name from the resolved path
+        base_name = basename(resolved_path);
+        tmp = string(resolved_path);
+    } else {
+      // command is in PATH (system comand), keep its name
+      base_name = tmp;
+    }
+    path = tmp;
+}
+
+/* Fork a child that runs a shell command, as system() would, once
+ * release_child(*release) is called: counters can be attached to it
+ * before it starts (see enable_on_exec) */
+pid_t spawn_held(const string &command, int *release) {
+  int gate[2];
+  if (pipe(gate) != 0) {
+    perror("pipe");
+    exit(1);
+  }
+  pid_t pid = fork();
+  if (pid < 0) {
+    perror("fork");
+    exit(1);
+  }
+  if (pid == 0) {
+    char c;
+    close(gate[1]);
+    /* Returns at EOF, once the parent closes its end */
+    while (read(gate[0], &c, 1) < 0 && errno == EINTR)
+      ;
+    close(gate[0]);
+    execl("/bin/sh", "sh", "-c", command.c_str(), (char *)NULL);
+    perror("execl");
+    _exit(127);
+  }
+  close(gate[0]);
+  *release = gate[1];
+  return pid;
+}
+
+void release_child(int release) {
+  close(release);
+}
+
+/* Run a shell command in a child process, as system() would */
+pid_t spawn_command(const string &command) {
+  int release;
+  pid_t pid = spawn_held(command, &release);
+  release_child(release);
+  return pid;
+}
+
+/* Wait up to ms milliseconds for the child to exit.
+ * Returns true when it did. */
+bool wait_child(pid_t pid, long ms) {
+  int status;
+  for (;;) {
+    if (waitpid(pid, &status, WNOHANG) == pid)
+      return true;
+    if (ms <= 0)
+      return false;
+    long step = ms < 10 ? ms : 10;
+    struct timespec ts = {0, step * 1000000L};
+    nanosleep(&ts, NULL);
+    ms -= step;
+  }
+}
+
+/* Count the instructions retired by a held child (spawn_held) from its
+ * exec on (and by the children it creates, once they exit) */
+int open_instruction_counter(pid_t pid) {
+  struct perf_event_attr attr;
+  memset(&attr, 0, sizeof(attr));
+  attr.size = sizeof(attr);
+  attr.type = PERF_TYPE_HARDWARE;
+  attr.config = PERF_COUNT_HW_INSTRUCTIONS;
+  attr.disabled = 1;
+  attr.enable_on_exec = 1;
+  attr.inherit = 1;
+  attr.exclude_hv = 1;
+  int fd = syscall(__NR_perf_event_open, &attr, pid, -1, -1, 0);
+  if (fd < 0) {
+    perror("perf_event_open");
+    exit(1);
+  }
+  return fd;
+}
+
+/* Wait until the child retires n more instructions or exits.
+ * Returns true when it exited. */
+bool wait_instructions(pid_t pid, int fd, uint64_t n) {
+  uint64_t start, now;
+  int status;
+  if (read(fd, &start, sizeof(start)) != sizeof(start)) {
+    waitpid(pid, &status, 0);
+    return true;
+  }
+  for (;;) {
+    if (wait_child(pid, 1))
+      return true;
+    if (read(fd, &now, sizeof(now)) == sizeof(now) && now - start >= n)
+      return false;
+  }
+}
+
+/* Guest PMU events for 'benchmark --pmu': generic ones, and the
+ * armv8_pmuv3 cache events fed by VPSim's cache models */
+struct pmu_event {
+  const char *name;
+  uint32_t type;
+  uint64_t config;
+};
+
+static const pmu_event pmu_events[] = {
+  {"cycles",           PERF_TYPE_HARDWARE, PERF_COUNT_HW_CPU_CYCLES},
+  {"instructions",     PERF_TYPE_HARDWARE, PERF_COUNT_HW_INSTRUCTIONS},
+  {"l1d_cache",        PERF_TYPE_RAW,      0x04},
+  {"l1d_cache_refill", PERF_TYPE_RAW,      0x03},
+  {"l2d_cache",        PERF_TYPE_RAW,      0x16},
+  {"l2d_cache_refill", PERF_TYPE_RAW,      0x17},
+  {"ll_cache_rd",      PERF_TYPE_RAW,      0x36},
+  {"ll_cache_miss_rd", PERF_TYPE_RAW,      0x37},
+};
+
+struct pmu_counter {
+  string name;
+  int fd;
+};
+
+/* Open counters on a held child (spawn_held) and the children it
+ * creates, enabled when it execs the benchmark. events is a
+ * comma-separated list of names of pmu_events or raw event numbers
+ * (e.g. 0x2a); all of pmu_events when empty. */
+vector<pmu_counter> open_pmu_counters(const string &events, pid_t pid) {
+  const size_t n_known = sizeof(pmu_events) / sizeof(pmu_events[0]);
+  vector<pmu_event> wanted;
+  vector<string> labels;
+  if (events.empty()) {
+    for (size_t i = 0; i < n_known; i++) {
+      wanted.push_back(pmu_events[i]);
+      labels.push_back(pmu_events[i].name);
+    }
+  } else {
+    istringstream list(events);
+    string e;
+    while (getline(list, e, ',')) {
+      pmu_event ev = {NULL, PERF_TYPE_RAW, strtoull(e.c_str(), NULL, 0)};
+      for (size_t i = 0; i < n_known; i++)
+        if (e == pmu_events[i].name)
+          ev = pmu_events[i];
+      wanted.push_back(ev);
+      labels.push_back(e);
+    }
+  }
+
+  vector<pmu_counter> counters;
+  for (size_t i = 0; i < wanted.size(); i++) {
+    struct perf_event_attr attr;
+    memset(&attr, 0, sizeof(attr));
+    attr.size = sizeof(attr);
+    attr.type = wanted[i].type;
+    attr.config = wanted[i].config;
+    attr.disabled = 1;
+    attr.enable_on_exec = 1;
+    attr.inherit = 1;
+    attr.exclude_hv = 1;
+    int fd = syscall(__NR_perf_event_open, &attr, pid, -1, -1, 0);
+    if (fd < 0)
+      fprintf(stderr, "sesam: PMU event %s not available\n", labels[i].c_str());
+    counters.push_back({labels[i], fd});
+  }
+  return counters;
+}
+
+/* The counts as [Stats] lines of a 'guest_pmu' component, the format of
+ * the host logs */
+string read_pmu_counters(vector<pmu_counter> &counters) {
+  ostringstream s;
+  for (size_t i = 0; i < counters.size(); i++) {
+    uint64_t v;
+    if (counters[i].fd < 0)
+      continue;
+    if (read(counters[i].fd, &v, sizeof(v)) == sizeof(v))
+      s << "[Stats] (guest_pmu) " << counters[i].name << " " << v << " events\n";
+    close(counters[i].fd);
+    counters[i].fd = -1;
+  }
+  return s.str();
+}
+
+/* Parse a CPU list such as 0-3,8 */
+bool parse_cpu_list(const char *list, cpu_set_t *set) {
+  CPU_ZERO(set);
+  while (*list) {
+    char *end;
+    long first = strtol(list, &end, 10), last = first;
+    if (end == list)
+      return false;
+    if (*end == '-')
+      last = strtol(end + 1, &end, 10);
+    if (first < 0 || last < first || last >= CPU_SETSIZE)
+      return false;
+    for (long c = first; c <= last; c++)
+      CPU_SET(c, set);
+    if (*end == ',')
+      end++;
+    else if (*end != '\0')
+      return false;
+    list = end;
+  }
+  return CPU_COUNT(set) > 0;
+}
+
+/* n of the CPUs this process may run on: the first ones (compact) or
+ * evenly spaced ones (spread). Policies based on the NoC topology are
+ * computed on the host (armv8_platform.thread_placement) and given as a
+ * CPU list. */
+bool placement_cpus(const char *policy, cpu_set_t *set) {
+  cpu_set_t allowed;
+  int online[CPU_SETSIZE], n_online = 0;
+  const char *colon = strchr(policy, ':');
+  long n = colon ? atol(colon + 1) : 0;
+  string name(policy, colon ? colon - policy : strlen(policy));
+
+  if (sched_getaffinity(0, sizeof(allowed), &allowed) != 0)
+    return false;
+  for (int c = 0; c < CPU_SETSIZE; c++)
+    if (CPU_ISSET(c, &allowed))
+      online[n_online++] = c;
+  if (n <= 0 || n > n_online)
+    n = n_online;
+  CPU_ZERO(set);
+  for (long i = 0; i < n; i++) {
+    if (name == "compact")
+      CPU_SET(online[i], set);
+    else if (name == "spread")
+      CPU_SET(online[i * n_online / n], set);
+    else
+      return false;
+  }
+  return true;
+}
+
+/* The CPUs as [Stats] lines of a 'placement' component */
+string placement_stats(const cpu_set_t *set) {
+  ostringstream s;
+  string mask;
+  int last = CPU_SETSIZE - 1;
+  while (last > 0 && !CPU_ISSET(last, set))
+    last--;
+  for (int c = last / 4 * 4; c >= 0; c -= 4) {
+    int nibble = 0;
+    for (int b = 0; b < 4; b++)
+      if (CPU_ISSET(c + b, set))
+        nibble |= 1 << b;
+    mask += "0123456789abcdef"[nibble];
+  }
+  s << "[Stats] (placement) cpus " << CPU_COUNT(set) << " cpus\n";
+  s << "[Stats] (placement) cpu_mask 0x" << mask << " mask\n";
+  return s.str();
+}
+
+/* Send the name of the next benchmark region to the host, then open it */
+void start_region(const string &name) {
+  sesam_get_name(name.length(), name.c_str());
+  sesam_start_bench();
+}
+
+/* Options of 'benchmark', and of each line of a 'batch' file */
+struct bench_options {
+  bool pmu;
+  string pmu_list;
+  bool placed;
+  cpu_set_t cpus;
+
+  bench_options() : pmu(false), placed(false) {}
+};
+
+struct batch_job {
+  string name;
+  int repetitions;
+  int warmups;
+  bench_options opt;
+  string command;
+};
+
+/* Parse the options starting at argv[first]; returns the index of the
+ * application */
+int parse_bench_options(int argc, char **argv, int first, bench_options &opt) {
+  int app = first;
+  for (; app < argc && strncmp(argv[app], "--", 2) == 0; ++app) {
+    if (strcmp(argv[app], "--pmu") == 0) {
+      opt.pmu = true;
+    } else if (strncmp(argv[app], "--pmu=", 6) == 0) {
+      opt.pmu = true;
+      opt.pmu_list = argv[app] + 6;
+    } else if (strncmp(argv[app], "--cpus=", 7) == 0) {
+      if (!parse_cpu_list(argv[app] + 7, &opt.cpus)) {
+        printf("Invalid CPU list %s\n", argv[app] + 7);
+        exit(1);
+      }
+      opt.placed = true;
+    } else if (strncmp(argv[app], "--placement=", 12) == 0) {
+      if (!placement_cpus(argv[app] + 12, &opt.cpus)) {
+        printf("Placement should be compact[:<n>] or spread[:<n>]\n");
+        exit(1);
+      }
+      opt.placed = true;
+    } else {
+      printf("Unknown benchmark option %s\n", argv[app]);
+      exit(1);
+    }
+  }
+  return app;
+}
+
+/* Parse a count of a batch file in [min, INT_MAX]; false when it is not one */
+bool parse_count(const char *s, int min, int *value) {
+  char *end;
+  errno = 0;
+  long v = strtol(s, &end, 10);
+  if (end == s || *end != '\0' || errno == ERANGE || v < min || v > INT_MAX)
+    return false;
+  *value = (int)v;
+  return true;
+}
+
+/* Move to the CPUs of the options, if any; the benchmark and all its
+ * threads and children inherit the affinity */
+void apply_placement(const bench_options &opt, cpu_set_t *saved) {
+  if (!opt.placed)
+    return;
+  sched_getaffinity(0, sizeof(*saved), saved);
+  if (sched_setaffinity(0, sizeof(opt.cpus), &opt.cpus) != 0) {
+    perror("sched_setaffinity");
+    exit(1);
+  }
+}
+
+void restore_placement(const bench_options &opt, const cpu_set_t *saved) {
+  if (opt.placed)
+    sched_setaffinity(0, sizeof(*saved), saved);
+}
+
+/* Run a shell command as one benchmark region, dumped on the host as
+ * sesamBench_<name>_<n>.log */
+void run_benchmark(const string &name, const string &command, bench_options &opt, bool verbose) {
+  cpu_set_t saved;
+  apply_placement(opt, &saved);
+  /* Names the log of the run for the host tooling (guest.py) */
+  printf("sesam: region %s\n", name.c_str());
+  fflush(stdout);
+  /* The counters follow the benchmark only, not this process */
+  int release, status;
+  pid_t pid = spawn_held(command, &release);
+  vector<pmu_counter> counters;
+  if (opt.pmu)
+    counters = open_pmu_counters(opt.pmu_list, pid);
+  start_region(name);
+  release_child(release);
+  waitpid(pid, &status, 0);
+  string stats;
+  if (opt.placed)
+    stats += placement_stats(&opt.cpus);
+  if (opt.pmu)
+    stats += read_pmu_counters(counters);
+  if (!stats.empty()) {
+    /* On stdout only: the Monitor cannot add them to the log, the host
+     * picks them up from the output captured by guest.automate() */
+    printf("%s", stats.c_str());
+  }
+  sesam_end_bench(verbose);
+  restore_placement(opt, &saved);
+}
+
 int main(int argc, char **argv)
 {
   char cmd[20];
@@ -82,64 +505,181 @@ int main(int argc, char **argv)
     sesam_list_component();
   }
   else if (strcmp(cmd,"benchmark") == 0) {
-    if (argc < 3) {
+    bench_options opt;
+    int app = parse_bench_options(argc, argv, 2, opt);
+    if (argc <= app) {
       printf("Please put your benchmark application...");
-      printf("Usage: sesam benchmark <name_of_application>");
+      printf("Usage: sesam benchmark [--pmu[=event,...]] [--cpus=<list>|--placement=<policy>] <name_of_application>");
       exit(1);
     }
 
     ostringstream s;
-    string tmp = argv[2];
-    bool is_local_executable = false;
+    string tmp, base_name;
+    resolve_application(argv[app], tmp, base_name);
 
-    // Check if the provided executable name contains a path
-    if (tmp.find('/') == string::npos) { // no path provided
-      // Check if it's a system command
-      if (!is_system_command(tmp.c_str())) {
-        // Not a system command, prepend "./" to check the current directory
-        string current_dir_app = "./" + tmp;
-        if (file_exists(current_dir_app.c_str())) {
-            tmp = current_dir_app;  // Use current directory version
-            is_local_executable = true;
-        } else {
-            printf("Application %s not found in current directory or system PATH\n", tmp.c_str());
-            exit(1);
-        }
-      } // Continue if the app is a system command
-    } else { //A path is provided with the app
-        is_local_executable = true;
+    // Build the command string with absolute path and additional arguments
+    s << tmp;
+    for (int i = app + 1; i < argc; ++i) {
+        s << " " << argv[i];
     }
-    string base_name;
-    if (is_local_executable) {
-        // Resolve the absolute path for local executables
-        char resolved_path[PATH_MAX];
-        if (realpath(tmp.c_str(), resolved_path) == NULL) {
-            perror("realpath");
-            exit(1);
-        }
-        // Extract the base name from the resolved path
-        base_name = basename(resolved_path);
-        tmp = string(resolved_path);
-    } else {
-      // command is in PATH (system comand), keep its name
-      base_name = tmp;
+    run_benchmark(base_name, s.str(), opt, true);
+
+  }
+  else if (strcmp(cmd,"batch") == 0) {
+    if (argc < 3) {
+      printf("Usage: sesam batch <file>\n");
+      exit(1);
+    }
+    ifstream file(argv[2]);
+    if (!file) {
+      perror(argv[2]);
+      exit(1);
     }
 
-    int n = base_name.length();
-    char name[n+1];
-    strcpy(name, base_name.c_str());
-    // Get the app name in HOST machine
-    sesam_get_name(n, name);
+    /* Check the whole file before spending simulated time on it */
+    vector<batch_job> jobs;
+    string line;
+    for (int lineno = 1; getline(file, line); ++lineno) {
+      istringstream ls(line);
+      vector<string> tokens;
+      string t;
+      while (ls >> t)
+        tokens.push_back(t);
+      if (tokens.empty() || tokens[0][0] == '#')
+        continue;
 
-    // Build the command string with absolute path and additional arguments
+      vector<char *> args;
+      for (size_t k = 0; k < tokens.size(); ++k)
+        args.push_back(&tokens[k][0]);
+      batch_job job;
+      int app = tokens.size() < 4 ? 0 : parse_bench_options(args.size(), args.data(), 3, job.opt);
+      if (app == 0 || app >= (int)args.size()) {
+        printf("%s:%d: expected <name> <repetitions> <warm-ups> [options] <command>\n", argv[2], lineno);
+        exit(1);
+      }
+      string path, base_name;
+      resolve_application(args[app], path, base_name);
+      job.name = tokens[0];
+      if (!parse_count(args[1], 1, &job.repetitions)) {
+        printf("%s:%d: invalid number of repetitions %s\n", argv[2], lineno, args[1]);
+        exit(1);
+      }
+      if (!parse_count(args[2], 0, &job.warmups)) {
+        printf("%s:%d: invalid number of warm-ups %s\n", argv[2], lineno, args[2]);
+        exit(1);
+      }
+      job.command = path;
+      for (size_t k = app + 1; k < args.size(); ++k)
+        job.command += string(" ") + args[k];
+      jobs.push_back(job);
+    }
+
+    for (size_t k = 0; k < jobs.size(); ++k) {
+      /* Warm-up runs stay outside any region, on the same CPUs as the
+       * measured ones */
+      for (int r = 0; r < jobs[k].warmups; ++r) {
+        cpu_set_t saved;
+        printf("sesam: %s warm-up %d/%d\n", jobs[k].name.c_str(), r + 1, jobs[k].warmups);
+        apply_placement(jobs[k].opt, &saved);
+        system(jobs[k].command.c_str());
+        restore_placement(jobs[k].opt, &saved);
+      }
+      for (int r = 0; r < jobs[k].repetitions; ++r) {
+        printf("sesam: %s run %d/%d\n", jobs[k].name.c_str(), r + 1, jobs[k].repetitions);
+        run_benchmark(jobs[k].name, jobs[k].command, jobs[k].opt, false);
+      }
+    }
+
+  }
+  else if (strcmp(cmd,"smarts") == 0) {
+    if (argc < 6) {
+      printf("Usage: sesam smarts <period-ms> <window-ms> <warmup-ms> <name_of_application>\n");
+      exit(1);
+    }
+    long period = atol(argv[2]);
+    long window = atol(argv[3]);
+    long warmup = atol(argv[4]);
+    if (window <= 0 || warmup < 0 || window + warmup > period) {
+      printf("The warm-up and the window must fit within the sampling period\n");
+      exit(1);
+    }
+
+    ostringstream s;
+    string tmp, base_name;
+    resolve_application(argv[5], tmp, base_name);
     s << tmp;
-    for (int i = 3; i < argc; ++i) {
+    for (int i = 6; i < argc; ++i) {
         s << " " << argv[i];
     }
-    sesam_start_bench();
-    // Execute the command using system()
-    system(s.str().c_str());
-    sesam_end_bench();
+
+    /* Fast-forward functionally, then warm the caches up and measure a
+     * detailed window, every period until the application exits. Windows
+     * are dumped on the host as sesamBench_<app>@w_<n>.log */
+    pid_t pid = spawn_command(s.str());
+    int windows = 0;
+    for (;;) {
+      if (wait_child(pid, period - window - warmup))
+        break;
+      if (warmup > 0) {
+        start_region(base_name + "@warmup");
+        bool done = wait_child(pid, warmup);
+        sesam_end_bench(false);
+        if (done)
+          break;
+      }
+      start_region(base_name + "@w");
+      bool done = wait_child(pid, window);
+      sesam_end_bench(false);
+      ++windows;
+      if (done)
+        break;
+    }
+    printf("sesam: %d detailed windows sampled\n", windows);
+
+  }
+  else if (strcmp(cmd,"sample") == 0) {
+    if (argc < 4) {
+      printf("Usage: sesam sample <N>ms|<N>insn <name_of_application>\n");
+      exit(1);
+    }
+    char *unit;
+    long interval = strtol(argv[2], &unit, 10);
+    bool by_instructions = strcmp(unit, "insn") == 0;
+    if (interval <= 0 || (!by_instructions && strcmp(unit, "ms") != 0 && *unit != '\0')) {
+      printf("The sampling interval should be <N>ms or <N>insn\n");
+      exit(1);
+    }
+
+    ostringstream s;
+    string tmp, base_name;
+    resolve_application(argv[3], tmp, base_name);
+    s << tmp;
+    for (int i = 4; i < argc; ++i) {
+        s << " " << argv[i];
+    }
+
+    /* Back-to-back regions of one interval each, until the application
+     * exits. Each one is dumped on the host as sesamBench_<app>@sample_<n>.log */
+    int release;
+    pid_t pid = spawn_held(s.str(), &release);
+    int fd = by_instructions ? open_instruction_counter(pid) : -1;
+    int samples = 0;
+    for (;;) {
+      start_region(base_name + "@sample");
+      /* The first region opens before the application starts */
+      if (release >= 0) {
+        release_child(release);
+        release = -1;
+      }
+      bool done = by_instructions ? wait_instructions(pid, fd, interval) : wait_child(pid, interval);
+      sesam_end_bench(false);
+      ++samples;
+      if (done)
+        break;
+    }
+    if (fd >= 0)
+      close(fd);
+    printf("sesam: %d samples\n", samples);
 
   } else {
     if (argc < 3) {
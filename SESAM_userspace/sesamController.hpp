@@ -24,14 +24,7 @@
 #include <iomanip>
 
 #include "sesam_mmap.h"
-
-/* sesam opcodes */
-#define SESAMOP                 0x00
-#define SESAMOP_SHOW            0x01
-#define SESAMOP_QUIT            0x42
-#define SESAMOP_START_BENCH     0x52
-#define SESAMOP_END_BENCH       0x54
-#define SESAMOP_LIST            0x20
+#include "sesam_opcodes.h"
 
 void sesam_quit() {
   *((uint8_t *)(sesam_mem)) = SESAMOP_QUIT;
@@ -60,37 +53,38 @@ void sesam_list_component(){
   }
 }
 
-void sesam_end_bench(){
+void sesam_end_bench(bool verbose = true){
   *((uint8_t *)(sesam_mem)) = SESAMOP_END_BENCH;
   char c = *((uint8_t *)(sesam_mem) + 1);
   while (c != '\0') {
-    printf("%c",c);
+    if (verbose)
+      printf("%c",c);
     c = *((uint8_t *)(sesam_mem) + 1);
   } 
 }
 
-void sesam_get_name(int n, char name[30]) {
-  *((uint8_t *)(sesam_mem)) = 0x58;
-  *((uint8_t *)(sesam_mem)) = 0x62;
+void sesam_get_name(int n, const char *name) {
+  *((uint8_t *)(sesam_mem)) = SESAMOP_CMD_BEGIN;
+  *((uint8_t *)(sesam_mem)) = SESAMOP_PARAM_BEGIN;
   for (int i = 0; i < n; i++) {
     *((uint8_t *)(sesam_mem + 1)) = name[i];
   }
-  *((uint8_t *)(sesam_mem)) = 0x72;
+  *((uint8_t *)(sesam_mem)) = SESAMOP_PARAM_END;
 }
 
 void sesam_exec_command(int nb_param, char parameter[10][30]) {
-  *((uint8_t *)(sesam_mem)) = 0x58;
+  *((uint8_t *)(sesam_mem)) = SESAMOP_CMD_BEGIN;
   for (int i = 0; i < nb_param; ++i) {
     int j = 0;
-    *((uint8_t *)(sesam_mem)) = 0x62;
+    *((uint8_t *)(sesam_mem)) = SESAMOP_PARAM_BEGIN;
 
     while (parameter[i][j] != '\0') {
       *((uint8_t *)(sesam_mem + 1)) = parameter[i][j];
       ++j;
     }
-    *((uint8_t *)(sesam_mem)) = 0x72;
+    *((uint8_t *)(sesam_mem)) = SESAMOP_PARAM_END;
   }
-  *((uint8_t *)(sesam_mem)) = 0x78;
+  *((uint8_t *)(sesam_mem)) = SESAMOP_CMD_EXEC;
 }
 
 #endif // __SESAM_H__
@@ -14,7 +14,9 @@
  * limitations under the License.
 */
 
+#include <dirent.h>
 #include <fcntl.h>
+#include <limits.h>
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
@@ -23,51 +25,149 @@
 #include <sys/types.h>
 
 #include "sesam_mmap.h"
+#include "sesam_opcodes.h"
 
 void *sesam_mem = NULL;
-int fd;
+size_t sesam_mem_size = 4;
+static int fd;
 
-void map_sesam_mem() {
-  /* Read configuration file */
-  unsigned int base_address;
+static unsigned long read_cells(const unsigned char *p, int cells) {
+  unsigned long v = 0;
+  int i;
+  for (i = 0; i < cells * 4; i++)
+    v = (v << 8) | p[i];
+  return v;
+}
+
+/* A one-cell property of a device tree node, or def when it has none */
+static int read_cell_prop(const char *dir, const char *name, int def) {
+  char path[PATH_MAX];
+  unsigned char buf[4];
+  FILE *f;
+
+  snprintf(path, sizeof(path), "%s/%s", dir, name);
+  if ((f = fopen(path, "r")) == NULL)
+    return def;
+  if (fread(buf, 1, 4, f) != 4)
+    buf[0] = buf[1] = buf[2] = buf[3] = 0xff; /* invalid, rejected by the caller */
+  fclose(f);
+  return (int)read_cells(buf, 1);
+}
+
+/* Look for the Monitor node (compatible "cea,sesam-monitor") in a device
+ * tree directory and its subnodes, and read its address and size from the
+ * first entry of its reg, in the #address-cells and #size-cells of its
+ * parent (acells, scells) */
+static int find_monitor(const char *dir, int depth, int acells, int scells,
+                        unsigned long *base, unsigned long *size) {
+  char path[PATH_MAX];
+  unsigned char buf[256];
+  struct dirent *e;
+  struct stat st;
+  size_t i, n;
+  DIR *d;
+  FILE *f;
+
+  snprintf(path, sizeof(path), "%s/compatible", dir);
+  if ((f = fopen(path, "r")) != NULL) {
+    n = fread(buf, 1, sizeof(buf) - 1, f);
+    fclose(f);
+    buf[n] = '\0';
+    /* A list of NUL-terminated strings */
+    for (i = 0; i < n; i += strlen((char *)buf + i) + 1) {
+      if (strcmp((char *)buf + i, SESAM_MONITOR_COMPATIBLE) != 0)
+        continue;
+      snprintf(path, sizeof(path), "%s/reg", dir);
+      if ((f = fopen(path, "r")) == NULL)
+        return 0;
+      n = fread(buf, 1, sizeof(buf), f);
+      fclose(f);
+      if (acells < 1 || acells > 2 || scells < 0 || scells > 2
+          || n < (size_t)(acells + scells) * 4)
+        return 0;
+      *base = read_cells(buf, acells);
+      *size = scells ? read_cells(buf + acells * 4, scells) : 0;
+      return 1;
+    }
+  }
+  if (depth == 0 || (d = opendir(dir)) == NULL)
+    return 0;
+  /* Cells of the reg of the subnodes, with the defaults of the spec */
+  acells = read_cell_prop(dir, "#address-cells", 2);
+  scells = read_cell_prop(dir, "#size-cells", 1);
+  while ((e = readdir(d)) != NULL) {
+    if (e->d_name[0] == '.')
+      continue;
+    snprintf(path, sizeof(path), "%s/%s", dir, e->d_name);
+    if (stat(path, &st) == 0 && S_ISDIR(st.st_mode)
+        && find_monitor(path, depth - 1, acells, scells, base, size)) {
+      closedir(d);
+      return 1;
+    }
+  }
+  closedir(d);
+  return 0;
+}
+
+/* Find and map the Monitor, without printing anything; returns
+ * SESAM_MAP_OK or the step that failed. The Monitor address is left in
+ * *base. */
+int sesam_map_monitor(unsigned long *base) {
+  unsigned long size = 0;
   FILE *fp;
 
+  *base = 0;
+  /* /etc/config_sesam ('<hex address> [<hex size>]') overrides the
+   * Monitor described in the device tree */
   fp = fopen("/etc/config_sesam","r");
-
-  if (fp == NULL)
-  {
-    perror("Error while opening /etc/config_sesam");
-    printf("Please type in your terminal 'echo [hex addr sesam_monitor] > /etc/config_sesam'\n");
-    exit(1);
+  if (fp != NULL) {
+    if (fscanf(fp, "%lx %lx", base, &size) < 1)
+      *base = 0;
+    fclose(fp);
   }
-  
-  fscanf(fp, "%x", &base_address);
-  fclose(fp);
+  if (*base == 0
+      && !find_monitor("/proc/device-tree", 3, 2, 1, base, &size)
+      && !find_monitor("/sys/firmware/devicetree/base", 3, 2, 1, base, &size))
+    return SESAM_MAP_NOT_FOUND;
+  if (size > 4)
+    sesam_mem_size = size;
 
   /* Open the memory device */
   fd = open("/dev/mem", O_RDWR | O_SYNC);
-  if (fd < 1) {
-    perror("sesam_mmap");
-    exit(1);
+  if (fd < 0)
+    return SESAM_MAP_NO_DEVMEM;
+
+  /* The whole Monitor, as sized by the device tree or /etc/config_sesam */
+  sesam_mem = mmap(NULL, sesam_mem_size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, *base);
+  if (sesam_mem == MAP_FAILED) {
+    sesam_mem = NULL;
+    close(fd);
+    return SESAM_MAP_FAILED;
   }
+  return SESAM_MAP_OK;
+}
+
+void map_sesam_mem() {
+  unsigned long base_address;
 
-  if (base_address == 0) {
-    printf("File /etc/config_sesam is empty or not in the right format\n");
+  switch (sesam_map_monitor(&base_address)) {
+  case SESAM_MAP_OK:
+    return;
+  case SESAM_MAP_NOT_FOUND:
+    printf("No %s node in the device tree and no /etc/config_sesam\n", SESAM_MONITOR_COMPATIBLE);
     printf("Please type in your terminal 'echo [hex addr sesam_monitor] > /etc/config_sesam'\n");
-    exit(1);
-  }
- 
-  /* Map only 4 bytes */
-  sesam_mem = mmap(NULL, 4, PROT_READ | PROT_WRITE, MAP_SHARED, fd, base_address);
-  if (sesam_mem == MAP_FAILED)
-  {
+    break;
+  case SESAM_MAP_NO_DEVMEM:
+    perror("sesam_mmap");
+    break;
+  default:
     printf("mmap failed\n");
-    printf("Please check the correct address in /etc/config_sesam\n");
-    exit(1);
+    printf("Please check the Monitor address (0x%lx)\n", base_address);
   }
+  exit(1);
 }
 
 void unmap_sesam() {
-  munmap(sesam_mem, fd);
+  munmap(sesam_mem, sesam_mem_size);
   close(fd);
 }
@@ -18,11 +18,23 @@
 #define __SESAM_MMAP_H__
 
 #include <fcntl.h>
+#include <stddef.h>
+#include <stdint.h>
 #include <unistd.h>
 #include <sys/mman.h>
 
 extern void *sesam_mem;
+extern size_t sesam_mem_size;
 
+/* Results of sesam_map_monitor() */
+#define SESAM_MAP_OK        0
+#define SESAM_MAP_NOT_FOUND 1   /* no device tree node nor /etc/config_sesam */
+#define SESAM_MAP_NO_DEVMEM 2   /* /dev/mem cannot be opened */
+#define SESAM_MAP_FAILED    3   /* mmap failed */
+
+int sesam_map_monitor(unsigned long *base);
+
+/* Same, printing the error and exiting on failure (the sesam tool) */
 void map_sesam_mem();
 
 void unmap_sesam();
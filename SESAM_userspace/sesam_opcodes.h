@@ -0,0 +1,60 @@
+/*
+ * Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+
+ *    http://www.apache.org/licenses/LICENSE-2.0 
+
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+*/
+
+#ifndef __SESAM_OPCODES_H__
+#define __SESAM_OPCODES_H__
+
+/* Device tree compatible of the Monitor node */
+#define SESAM_MONITOR_COMPATIBLE "cea,sesam-monitor"
+
+/* Opcodes written to the first byte of the Monitor (shared by the sesam
+ * tool and the ROI library, so this header must stay valid C) */
+#define SESAMOP                 0x00
+#define SESAMOP_SHOW            0x01
+#define SESAMOP_LIST            0x20
+#define SESAMOP_QUIT            0x42
+#define SESAMOP_START_BENCH     0x52
+#define SESAMOP_END_BENCH       0x54
+
+/* Command protocol: BEGIN, then each parameter as PARAM_BEGIN, its
+ * characters written one by one at offset 1, PARAM_END; EXEC runs the
+ * command. A single parameter without EXEC names the next benchmark. */
+#define SESAMOP_CMD_BEGIN       0x58
+#define SESAMOP_PARAM_BEGIN     0x62
+#define SESAMOP_PARAM_END       0x72
+#define SESAMOP_CMD_EXEC        0x78
+
+/* Proposed bulk mailbox, to replace the one-trap-per-character protocol
+ * above. Not implemented by the VPSim Monitor yet, so neither the tool nor
+ * the ROI library use it. In Monitors larger than SESAM_MAILBOX_OFFSET
+ * bytes:
+ *   +0x4  u32 SESAM_MAILBOX_MAGIC when the Monitor implements the mailbox
+ *   +0x8  u32 length of the payload
+ *   +SESAM_MAILBOX_OFFSET  payload, up to the end of the Monitor
+ * The guest writes the payload and its length, then rings the doorbell by
+ * writing one of the MBOX opcodes. END_BENCH replies with the stats string
+ * in the payload. */
+#define SESAM_MAILBOX_MAGIC_REG 0x4
+#define SESAM_MAILBOX_LENGTH    0x8
+#define SESAM_MAILBOX_OFFSET    0x100
+#define SESAM_MAILBOX_MAGIC     0x58424d53  /* "SMBX" */
+
+#define SESAMOP_MBOX_END_BENCH  0x56        /* reply: stats */
+#define SESAMOP_MBOX_CMD        0x59        /* parameters separated by '\0' */
+#define SESAMOP_MBOX_NAME       0x5A        /* name of the next benchmark */
+#define SESAMOP_MBOX_STATS      0x5B        /* [Stats] lines for the open benchmark log */
+
+#endif // __SESAM_OPCODES_H__
@@ -0,0 +1,69 @@
+/*
+ * Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+
+ *    http://www.apache.org/licenses/LICENSE-2.0 
+
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+*/
+
+#include <stdint.h>
+#include <string.h>
+
+#include "sesam_mmap.h"
+#include "sesam_opcodes.h"
+#include "sesam_roi.h"
+
+static int roi_open = 0;
+static int no_monitor = 0;
+
+/* NULL when the Monitor cannot be mapped: the application then runs
+ * unmeasured instead of exiting. The failure is not retried. */
+static volatile uint8_t *monitor(void) {
+  unsigned long base;
+
+  if (sesam_mem == NULL && !no_monitor
+      && sesam_map_monitor(&base) != SESAM_MAP_OK)
+    no_monitor = 1;
+  return (volatile uint8_t *)sesam_mem;
+}
+
+int sesam_roi_begin(const char *name) {
+  volatile uint8_t *mem = monitor();
+  size_t i, n = strlen(name);
+
+  if (mem == NULL)
+    return -1;
+  if (roi_open)
+    sesam_roi_end();
+
+  /* Name of the region, then start it */
+  mem[0] = SESAMOP_CMD_BEGIN;
+  mem[0] = SESAMOP_PARAM_BEGIN;
+  for (i = 0; i < n; i++)
+    mem[1] = name[i];
+  mem[0] = SESAMOP_PARAM_END;
+  mem[0] = SESAMOP_START_BENCH;
+  roi_open = 1;
+  return 0;
+}
+
+void sesam_roi_end(void) {
+  volatile uint8_t *mem = (volatile uint8_t *)sesam_mem;
+
+  if (!roi_open)
+    return;
+  /* The Monitor returns the stats of the region as a string: drop it,
+   * they are dumped on the host anyway */
+  roi_open = 0;
+  mem[0] = SESAMOP_END_BENCH;
+  while (mem[1] != '\0')
+    ;
+}
@@ -0,0 +1,47 @@
+/*
+ * Copyright (C) 2024 Commissariat à l'énergie atomique et aux énergies alternatives (CEA)
+
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ * You may obtain a copy of the License at
+
+ *    http://www.apache.org/licenses/LICENSE-2.0 
+
+ * Unless required by applicable law or agreed to in writing, software
+ * distributed under the License is distributed on an "AS IS" BASIS,
+ * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+ * See the License for the specific language governing permissions and
+ * limitations under the License.
+*/
+
+#ifndef __SESAM_ROI_H__
+#define __SESAM_ROI_H__
+
+/* Regions of interest marked inside an application:
+ *
+ *   sesam_roi_begin("kernel");
+ *   ...hot loop...
+ *   sesam_roi_end();
+ *
+ * Each region is dumped on the host as sesamBench_<name>_<n>.log, like a
+ * 'sesam benchmark' run, but without the fork/exec and shell startup of
+ * the benchmarked command. Regions do not nest: beginning a region ends
+ * the open one. Link with -lsesam_roi.
+ *
+ * When the Monitor cannot be found or mapped (not running on VPSim, no
+ * access to /dev/mem), sesam_roi_begin() returns -1 and both calls do
+ * nothing: the application still runs, unmeasured. */
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+int sesam_roi_begin(const char *name);
+
+void sesam_roi_end(void);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif // __SESAM_ROI_H__